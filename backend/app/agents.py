@@ -6,15 +6,71 @@ from langchain.prompts import PromptTemplate
 from langchain_together import ChatTogether
 from langchain.memory import ConversationBufferMemory
 from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_community.utilities.duckduckgo_search import DuckDuckGoSearchAPIWrapper
 from langchain.chains.summarize import load_summarize_chain
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import WebBaseLoader
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+import asyncio
+import contextvars
 import json
 import random
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import itertools
 import os
+import threading
+import time
+
+from .budget import AgentBudget, BudgetCallback, compact_steps, estimate_tokens
+from . import metrics, tracing
+from .catalog import DISH_CATALOG_PATH, DishCatalog, open_catalog
+from .dish_index import DishIndex, split_cuisines
+from .keywords import KeywordMatcher, NUTRITION_TAG, INGREDIENT_TAG
+from .menu_cache import MenuCache, menu_cache
+from .tool_cache import TOOL_TIMEOUT_SECONDS, ToolResultCache, tool_cache, normalize_query, normalize_url
+from .planner import WeeklyMenuPlanner, DAYS, normalize_key
+
+# Matches one complete day object of the menu JSON, e.g. "Monday": {"breakfast": "Poha", ...}
+DAY_MENU_PATTERN = re.compile(r'"(' + "|".join(DAYS) + r')"\s*:\s*(\{[^{}]*\})')
+
+def extract_day_menus(text: str) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """Yield (day, meals) for every complete day object found in text"""
+    for match in DAY_MENU_PATTERN.finditer(text or ""):
+        try:
+            yield match.group(1), json.loads(match.group(2))
+        except ValueError:
+            continue
+
+def run_coroutine(coro) -> Any:
+    """Run a coroutine from sync code; on a thread that already runs an event loop it runs on a new thread"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="menu-parallel") as pool:
+        return pool.submit(contextvars.copy_context().run, asyncio.run, coro).result()
+
+def budget_attributes(budget: AgentBudget) -> Dict[str, Any]:
+    """Span attributes describing what an agent run spent"""
+    return {"llm_calls": budget.llm_calls, "tokens": budget.tokens, "stopped": budget.stopped}
+
+# When disabled the local planner serves every request and the LLM agent is only
+# consulted for slots the dish database cannot fill
+USE_LLM_ENRICHMENT = os.getenv("MENU_LLM_ENRICHMENT", "0") == "1"
+
+# "parallel" fans the LLM work out into concurrent per-day calls instead of one ReAct loop
+PARALLEL_GENERATION = os.getenv("MENU_GENERATION_MODE", "agent") == "parallel"
+# Rounds of re-querying clashing slots before they are filled from the local database
+MAX_MERGE_ROUNDS = 2
+# Tools that go to the network and get the budget's remaining time as their timeout
+WEB_TOOLS = ("search_for_new_dishes", "summarize_web_content")
+# Final answer AgentExecutor gives when it stops on max_iterations or max_execution_time
+AGENT_STOPPED_PREFIX = "Agent stopped"
+# How long a shared agent whose LLM client failed to initialise is reused before trying again
+AGENT_RETRY_SECONDS = float(os.getenv("MENU_AGENT_RETRY_SECONDS", "60"))
 
 class IndianMenuDatabase:
     """Simulated database of Indian dishes - replace with actual DB queries later"""
@@ -157,44 +213,92 @@ class IndianMenuDatabase:
         "low_oil": ["Steamed", "Boiled", "Grilled", "Idli", "Upma"],
         "diabetic_friendly": ["Dal", "Vegetables", "Grilled items", "Salad", "Upma", "Poha"]
     }
+    
+    INGREDIENT_MAPPING = {
+        "Dal": ("grains_pulses", ["Toor Dal", "Moong Dal", "Masoor Dal"]),
+        "Paneer": ("dairy_proteins", ["Paneer", "Milk"]),
+        "Chicken": ("dairy_proteins", ["Chicken"]),
+        "Rice": ("grains_pulses", ["Basmati Rice"]),
+        "Roti": ("grains_pulses", ["Wheat Flour"]),
+        "Bhindi": ("vegetables", ["Bhindi (Okra)"]),
+        "Aloo": ("vegetables", ["Potatoes"]),
+        "Palak": ("vegetables", ["Spinach"]),
+        "Gobi": ("vegetables", ["Cauliflower"]),
+        "Fish": ("dairy_proteins", ["Fresh Fish"]),
+        "Egg": ("dairy_proteins", ["Eggs"]),
+        "Chole": ("grains_pulses", ["Chickpeas"]),
+        "Rajma": ("grains_pulses", ["Kidney Beans"])
+    }
+
+def build_dish_tagger(database) -> KeywordMatcher:
+    """Tags each dish name with its nutrition categories and grocery ingredients in one scan"""
+    return KeywordMatcher({
+        **{(NUTRITION_TAG, category): keywords for category, keywords in database.NUTRITIONAL_BALANCE.items()},
+        **{(INGREDIENT_TAG, ingredient): [ingredient] for ingredient in database.INGREDIENT_MAPPING}
+    })
+
+# Built once at import; shared by every MenuGenerationTools instance of the built-in database
+DISH_INDEX = DishIndex(IndianMenuDatabase.DISHES)
+DISH_TAGGER = build_dish_tagger(IndianMenuDatabase)
+
+# On-disk catalog replacing the built-in dishes when DISH_CATALOG_PATH is set; dishes
+# it does not know are still tagged by keyword. No file is read until the first lookup.
+DISH_CATALOG = open_catalog(DISH_CATALOG_PATH, IndianMenuDatabase.NUTRITIONAL_BALANCE, DISH_TAGGER,
+                            IndianMenuDatabase.INGREDIENT_MAPPING)
 
 class MenuGenerationTools:
     """Tools for the LangChain agent to use"""
     
-    def __init__(self):
-        self.db = IndianMenuDatabase()
+    def __init__(self, database: IndianMenuDatabase = None):
+        # A DishCatalog, or any object with DISHES, NUTRITIONAL_BALANCE and INGREDIENT_MAPPING
+        database = database if database is not None else DISH_CATALOG
+        if database is None:
+            self.db = IndianMenuDatabase()
+            self.index = DISH_INDEX
+            self.tagger = DISH_TAGGER
+        elif isinstance(database, DishCatalog):
+            self.db = database
+            self.index = database.index
+            self.tagger = database.tagger
+        else:
+            self.db = database
+            self.index = DishIndex(database.DISHES)
+            self.tagger = build_dish_tagger(database)
     
     def get_dishes_by_criteria(self, cuisine: str, meal_type: str, diet_type: str, count: int = 5) -> List[str]:
         """Get dishes based on cuisine, meal type, and diet preference"""
         try:
-            cuisines = [c.strip() for c in cuisine.split(',') if c.strip()]
-            all_dishes = []
-            for c in cuisines:
-                dishes = self.db.DISHES.get(c, {}).get(meal_type, {}).get(diet_type, [])
-                all_dishes.extend(dishes)
-            
-            dishes_result = random.sample(list(set(all_dishes)), min(count, len(list(set(all_dishes))))) if all_dishes else []
+            cuisines = split_cuisines(cuisine)
+            dishes_result = self.index.sample(cuisines, meal_type, diet_type, int(count))
             
             # This is the key change: return a more informative string
             if not dishes_result:
-                return f"No dishes found in internal database for cuisine(s) {cuisines}, meal {meal_type}, diet {diet_type}."
+                return f"No dishes found in internal database for cuisine(s) {list(cuisines)}, meal {meal_type}, diet {diet_type}."
             return dishes_result
         except Exception as e:
             return f"An error occurred while fetching dishes: {e}"
     
+    def get_week_candidates(self, cuisines: List[str], meals: List[str], diet_type: str, days: List[str] = DAYS) -> Dict[str, Dict[str, tuple]]:
+        """Get candidate dishes for every day and meal of the week in one call"""
+        return self.index.week_candidates(cuisines, meals, diet_type, days)
+    
     def check_nutritional_balance(self, dishes: List[str], health_conditions: List[str]) -> Dict[str, Any]:
         """Check if the meal plan is nutritionally balanced"""
         balance_score = 0
         recommendations = []
         
-        protein_dishes = [dish for dish in dishes if any(protein in dish for protein in self.db.NUTRITIONAL_BALANCE["high_protein"])]
-        if len(protein_dishes) >= 2:
+        counts = {category: 0 for category in self.db.NUTRITIONAL_BALANCE}
+        for dish in dishes:
+            for namespace, name in self.tagger.tags(dish):
+                if namespace == NUTRITION_TAG:
+                    counts[name] += 1
+        
+        if counts["high_protein"] >= 2:
             balance_score += 25
         else:
             recommendations.append("Add more protein sources like Dal, Paneer, or Chicken")
         
-        fiber_dishes = [dish for dish in dishes if any(fiber in dish for fiber in self.db.NUTRITIONAL_BALANCE["high_fiber"])]
-        if len(fiber_dishes) >= 3:
+        if counts["high_fiber"] >= 3:
             balance_score += 25
         else:
             recommendations.append("Include more vegetables like Bhindi, Palak, or Mixed Vegetables")
@@ -205,8 +309,7 @@ class MenuGenerationTools:
             recommendations.append("Ensure variety - avoid repeating similar dishes")
         
         if "diabetes" in health_conditions:
-            diabetic_friendly = [dish for dish in dishes if any(friendly in dish for friendly in self.db.NUTRITIONAL_BALANCE["diabetic_friendly"])]
-            if len(diabetic_friendly) >= len(dishes) * 0.6:
+            if counts["diabetic_friendly"] >= len(dishes) * 0.6:
                 balance_score += 25
             else:
                 recommendations.append("Choose more diabetic-friendly options like Dal and Vegetables")
@@ -229,55 +332,69 @@ class MenuGenerationTools:
             "others": []
         }
         
-        ingredient_mapping = {
-            "Dal": ("grains_pulses", ["Toor Dal", "Moong Dal", "Masoor Dal"]),
-            "Paneer": ("dairy_proteins", ["Paneer", "Milk"]),
-            "Chicken": ("dairy_proteins", ["Chicken"]),
-            "Rice": ("grains_pulses", ["Basmati Rice"]),
-            "Roti": ("grains_pulses", ["Wheat Flour"]),
-            "Bhindi": ("vegetables", ["Bhindi (Okra)"]),
-            "Aloo": ("vegetables", ["Potatoes"]),
-            "Palak": ("vegetables", ["Spinach"]),
-            "Gobi": ("vegetables", ["Cauliflower"]),
-            "Fish": ("dairy_proteins", ["Fresh Fish"]),
-            "Egg": ("dairy_proteins", ["Eggs"]),
-            "Chole": ("grains_pulses", ["Chickpeas"]),
-            "Rajma": ("grains_pulses", ["Kidney Beans"])
-        }
-        
         all_dishes = []
         for day_menu in weekly_menu.values():
             all_dishes.extend(day_menu.values())
         
+        found = {category: set() for category in grocery_categories}
         for dish in all_dishes:
-            for ingredient, (category, items) in ingredient_mapping.items():
-                if ingredient in dish:
-                    grocery_categories[category].extend(items)
+            for namespace, name in self.tagger.tags(dish):
+                if namespace == INGREDIENT_TAG:
+                    category, items = self.db.INGREDIENT_MAPPING[name]
+                    found[category].update(items)
         
         for category in grocery_categories:
-            grocery_categories[category] = list(set(grocery_categories[category]))
+            grocery_categories[category] = list(found[category])
         
         return grocery_categories
 
+class TimedDuckDuckGoSearch(DuckDuckGoSearchAPIWrapper):
+    """DuckDuckGo search whose HTTP requests give up after timeout seconds"""
+
+    timeout: int = int(TOOL_TIMEOUT_SECONDS)
+
+    def _ddgs_text(self, query: str, max_results: Optional[int] = None) -> List[Dict[str, str]]:
+        from duckduckgo_search import DDGS
+
+        with DDGS(timeout=self.timeout) as ddgs:
+            results = ddgs.text(
+                query,
+                region=self.region,
+                safesearch=self.safesearch,
+                timelimit=self.time,
+                max_results=max_results or self.max_results,
+                backend=self.backend,
+            )
+            return list(results) if results else []
+
 class IndianMenuAgent:
     """Main agent class for generating Indian meal plans"""
     
-    def __init__(self, together_api_key: str):
+    def __init__(self, together_api_key: str, use_llm: bool = USE_LLM_ENRICHMENT, cache: MenuCache = menu_cache,
+                 tool_cache: ToolResultCache = tool_cache, parallel: bool = PARALLEL_GENERATION, llm=None,
+                 tools_handler: MenuGenerationTools = None):
         self.together_api_key = together_api_key
-        try:
-            os.environ["TOGETHER_API_KEY"] = together_api_key
-            self.llm = ChatTogether(
-                temperature=0.7,
-                model="meta-llama/Llama-3-8b-chat-hf"
-            )
-        except Exception as e:
-            print(f"Warning: Could not initialize Together AI client: {e}")
-            self.llm = None
+        self.use_llm = use_llm
+        self.parallel = parallel
+        self.cache = cache
+        self.tool_cache = tool_cache
+        # Any LangChain chat model can replace Together, e.g. a stub in benchmarks
+        self.llm = llm
+        if self.llm is None:
+            try:
+                os.environ["TOGETHER_API_KEY"] = together_api_key
+                self.llm = ChatTogether(
+                    temperature=0.7,
+                    model="meta-llama/Llama-3-8b-chat-hf",
+                    callbacks=[metrics.LLMMetricsCallback(), tracing.TracingCallback()]
+                )
+            except Exception as e:
+                print(f"Warning: Could not initialize Together AI client: {e}")
             
-        self.tools_handler = MenuGenerationTools()
-        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True) if self.llm else None
+        self.tools_handler = tools_handler or MenuGenerationTools()
+        self.planner = WeeklyMenuPlanner(self.tools_handler)
         self.tools = self._create_tools() if self.llm else []
-        self.agent_executor = self._create_agent() if self.llm else None
+        self.agent = self._create_agent() if self.llm else None
 
     def _parse_get_dishes_input(self, input_str: str) -> str:
         """Parse input for get_dishes_by_criteria to ensure count is an integer"""
@@ -293,20 +410,31 @@ class IndianMenuAgent:
     def _create_tools(self) -> List[Tool]:
         """Create tools for the agent, including new web search tools."""
         
-        search = DuckDuckGoSearchRun()
+        # The fetches carry their own timeout: a caller that stops waiting cannot stop the thread
+        search = DuckDuckGoSearchRun(api_wrapper=TimedDuckDuckGoSearch())
+        
+        def summarize(url: str) -> str:
+            loader = WebBaseLoader(url, requests_kwargs={"timeout": TOOL_TIMEOUT_SECONDS})
+            docs = loader.load()
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
+            split_docs = text_splitter.split_documents(docs)
+            summarize_chain = load_summarize_chain(self.llm, chain_type="stuff")
+            return summarize_chain.run(split_docs)
+        
+        # Web lookups go through the shared tool cache: one fetch per query or URL per TTL
+        def search_for_new_dishes(query: str, timeout: float = None) -> str:
+            try:
+                return self.tool_cache.call("search", normalize_query(query), search.run, query, timeout=timeout)
+            except Exception as e:
+                return f"Error searching for {query}: {e}"
         
-        def get_summary(url: str) -> str:
+        def get_summary(url: str, timeout: float = None) -> str:
             try:
-                loader = WebBaseLoader(url)
-                docs = loader.load()
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-                split_docs = text_splitter.split_documents(docs)
-                summarize_chain = load_summarize_chain(self.llm, chain_type="stuff")
-                return summarize_chain.run(split_docs)
+                return self.tool_cache.call("summary", normalize_url(url), summarize, url.strip().strip("'\""), timeout=timeout)
             except Exception as e:
                 return f"Error summarizing URL {url}: {e}"
         
-        return [
+        tools = [
             Tool(
                 name="get_dishes_by_criteria",
                 description="Get dishes from the internal database based on cuisine, meal type, and diet preference. Input: 'cuisine,meal_type,diet_type,count'. 'count' must be a number. This tool will return a list of dishes or a message if none are found. The agent should use 'search_for_new_dishes' if the result indicates no dishes were found.",
@@ -325,7 +453,7 @@ class IndianMenuAgent:
             Tool(
                 name="search_for_new_dishes",
                 description="Searches the web for latest Indian dish ideas, recipes, or trends. Use this tool if the internal database does not return results or if the user requests modern/new dishes. Input should be a specific search query like 'latest Punjabi breakfast dishes' or 'new vegan dinner recipes'.",
-                func=search.run
+                func=search_for_new_dishes
             ),
             Tool(
                 name="summarize_web_content",
@@ -333,6 +461,9 @@ class IndianMenuAgent:
                 func=get_summary
             )
         ]
+        for tool in tools:
+            tool.func = tracing.trace_tool(tool.name, metrics.instrument_tool(tool.name, tool.func))
+        return tools
     
     def _parse_balance_input(self, input_str: str) -> Dict:
         """Parse input for nutritional balance check"""
@@ -341,8 +472,8 @@ class IndianMenuAgent:
         health_conditions = parts[1].split(",") if len(parts) > 1 and parts[1] else []
         return self.tools_handler.check_nutritional_balance(dishes, health_conditions)
     
-    def _create_agent(self) -> AgentExecutor:
-        """Create the main agent executor"""
+    def _create_agent(self):
+        """Create the ReAct agent; built once and shared by every executor"""
         
         prompt_template = """
 You are an expert Indian cuisine meal planner. Your goal is to create balanced, diverse, and delicious weekly meal plans.
@@ -375,28 +506,83 @@ Thought: {agent_scratchpad}
         
         prompt = PromptTemplate.from_template(prompt_template)
         
-        agent = create_react_agent(
+        return create_react_agent(
             llm=self.llm,
             tools=self.tools,
             prompt=prompt
         )
-        
+    
+    def new_executor(self, budget: AgentBudget = None) -> AgentExecutor:
+        """Create an agent executor with its own conversation memory for a single request"""
+        budget = budget or AgentBudget()
         return AgentExecutor(
-            agent=agent,
-            tools=self.tools,
-            memory=self.memory,
+            agent=self.agent,
+            tools=self._budgeted_tools(budget),
+            memory=ConversationBufferMemory(memory_key="chat_history", return_messages=True, output_key="output"),
             verbose=True,
-            max_iterations=15,
+            max_iterations=min(15, budget.max_llm_calls),
+            max_execution_time=budget.max_seconds,
+            trim_intermediate_steps=compact_steps,
             handle_parsing_errors=True
         )
     
-    def generate_weekly_menu(self, preferences: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate a weekly menu based on user preferences"""
-        
-        if not self.agent_executor:
-            return self._fallback_menu_generation(preferences)
-        
-        prompt = f"""
+    def _budgeted_tools(self, budget: AgentBudget) -> List[Tool]:
+        """Per-request copies of the tools that stop working once the budget is spent"""
+        def guarded(tool: Tool):
+            def run(tool_input: str) -> str:
+                if budget.exhausted():
+                    return "Budget exhausted: do not call more tools, give the Final Answer now with the dishes found so far."
+                if tool.name in WEB_TOOLS:
+                    return tool.func(tool_input, timeout=min(self.tool_cache.timeout, budget.remaining_seconds()))
+                return tool.func(tool_input)
+            return Tool(name=tool.name, description=tool.description, func=run)
+        return [guarded(tool) for tool in self.tools]
+    
+    def _run_agent(self, prompt: str, budget: AgentBudget, run_span=None) -> Iterator[Dict[str, Any]]:
+        """Steps of one ReAct run, cut short as soon as the budget is spent.
+        Each step runs in an agent.iteration span under run_span (default: the current span)."""
+        steps = iter(self.new_executor(budget).iter({"input": prompt}, callbacks=[BudgetCallback(budget)]))
+        for iteration in itertools.count(1):
+            with tracing.span("agent.iteration", parent=run_span, iteration=iteration) as current:
+                step = next(steps, None)
+                if step is not None:
+                    current.set(
+                        tools=",".join(action.tool for action, _ in step.get("intermediate_step", [])),
+                        final="output" in step
+                    )
+            if step is None:
+                return
+            if "output" in step:
+                if step["output"].startswith(AGENT_STOPPED_PREFIX):
+                    budget.stopped = budget.stopped or budget.exhausted() or "iterations"
+                yield step
+                return
+            yield step
+            reason = budget.exhausted()
+            if reason:
+                budget.stopped = reason
+                return
+    
+    def plan_weekly_menu(self, preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """Plan a weekly menu locally with the constraint-based planner"""
+        with tracing.span("menu.plan") as current:
+            plan = self.planner.plan(preferences)
+            current.set(unfilled_slots=len(plan["unfilled_slots"]))
+        return {
+            "menu": plan["menu"],
+            "preferences_used": preferences,
+            "generated_at": datetime.now().isoformat(),
+            "planner_used": True,
+            "balance_score": plan["balance_score"],
+            "unfilled_slots": plan["unfilled_slots"]
+        }
+
+    def _needs_agent(self, planned: Dict[str, Any]) -> bool:
+        # The LLM is an optional enrichment step on top of the local plan
+        return bool(self.agent) and (self.use_llm or bool(planned["unfilled_slots"]))
+    
+    def _build_menu_prompt(self, preferences: Dict[str, Any]) -> str:
+        return f"""
         Create a 7-day meal plan with the following preferences:
         - Diet Type: {preferences.get('diet_type')}
         - Cuisines: {', '.join(preferences.get('cuisine', []))}
@@ -421,15 +607,342 @@ Thought: {agent_scratchpad}
         
         Also provide a brief nutritional analysis and any recommendations.
         """
+    
+    def generate_weekly_menu(self, preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate a weekly menu based on user preferences"""
         
+        planned = self.plan_weekly_menu(preferences)
+        if not self._needs_agent(planned):
+            return planned
+        
+        cached = self._cached_menu(preferences)
+        if cached:
+            return cached
+        
+        if self.parallel:
+            try:
+                return self._store_in_cache(run_coroutine(self.agenerate_weekly_menu_parallel(preferences, planned)))
+            except Exception as e:
+                print(f"Error in parallel menu generation: {e}")
+                metrics.MENU_FALLBACKS.labels("agent_error").inc()
+                return planned
+        
+        for item in self._agent_events(preferences, planned):
+            if item["event"] == "result":
+                return item["data"]
+        return planned
+    
+    def regenerate_slots(self, menu: Dict[str, Dict[str, str]], preferences: Dict[str, Any],
+                         slots: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Replace the dishes of several (day, meal) slots.
+
+        The local planner picks each dish from the dish database; the agent is
+        only asked for slots the database has no unused candidate for. Slots
+        neither can fill keep their dish. Returns the new menu and, per
+        "Day-meal" slot, whether the dish came from the planner or the agent.
+        """
+        result = self.planner.replace(menu, slots, preferences)
+        new_menu = result["menu"]
+        sources = {f"{day}-{meal}": "planner" for day, meal in result["replaced"]}
+        for day, meal in result["unfilled"]:
+            dish = self._suggest_dish(preferences, new_menu, day, meal) if self.agent else None
+            if dish:
+                new_menu[day][meal] = dish
+                sources[f"{day}-{meal}"] = "agent"
+        return {"menu": new_menu, "sources": sources, "balance_score": result["balance_score"]}
+
+    def _suggest_dish(self, preferences: Dict[str, Any], menu: Dict[str, Dict[str, str]], day: str, meal: str) -> Optional[str]:
+        """Ask the agent for one new dish, possibly searching online"""
+        prompt = f"Suggest one new dish for {day}'s {meal} with cuisine '{preferences['cuisine'][0]}' and diet type '{preferences['diet_type']}'. The current dishes are: {menu[day].values()}. Do not repeat any of them."
+        budget = AgentBudget()
+        output = None
         try:
-            response = self.agent_executor.invoke({"input": prompt})
-            return self._parse_agent_response(response["output"], preferences)
+            with tracing.span("agent.run", mode="slot", slot=f"{day}-{meal}") as current:
+                for step in self._run_agent(prompt, budget):
+                    output = step.get("output", output)
+                current.set(**budget_attributes(budget))
+        except Exception as e:
+            print(f"Error suggesting a dish for {day} {meal}: {e}")
+            return None
+        if budget.stopped or not output:
+            return None
+        # Only the dish name: the agent may add an explanation after it
+        return self._parse_slot_response(output) or None
+
+    def _cached_menu(self, preferences: Dict[str, Any]) -> Dict[str, Any]:
+        menu = self.cache.get(preferences) if self.cache else None
+        if menu is None:
+            return None
+        return {
+            "menu": menu,
+            "preferences_used": preferences,
+            "generated_at": datetime.now().isoformat(),
+            "cache_hit": True
+        }
+    
+    def _store_in_cache(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        # Only menus actually produced by the agent are worth caching
+        if self.cache and "agent_response" in result:
+            self.cache.put(result["preferences_used"], result["menu"])
+        return result
+    
+    def stream_weekly_menu(self, preferences: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Generate a weekly menu, yielding progress events as the work happens.
+        
+        Events are dicts with "event" and "data": "day" for each day's meals as
+        soon as they are known, "step" and "observation" for every agent action
+        and tool result, and a final "result" carrying the full menu result.
+        """
+        planned = self.plan_weekly_menu(preferences)
+        for day, meals in planned["menu"].items():
+            yield {"event": "day", "data": {"day": day, "meals": meals, "source": "planner"}}
+        
+        if not self._needs_agent(planned):
+            yield {"event": "result", "data": planned}
+            return
+        
+        cached = self._cached_menu(preferences)
+        if cached:
+            for day, meals in cached["menu"].items():
+                yield {"event": "day", "data": {"day": day, "meals": meals, "source": "cache"}}
+            yield {"event": "result", "data": cached}
+            return
+        
+        if self.parallel:
+            result = self.generate_weekly_menu(preferences)
+            for day, meals in result["menu"].items():
+                yield {"event": "day", "data": {"day": day, "meals": meals, "source": "agent"}}
+            yield {"event": "result", "data": result}
+            return
+        
+        yield from self._agent_events(preferences, planned)
+    
+    def _agent_events(self, preferences: Dict[str, Any], planned: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Run the ReAct agent under an AgentBudget, yielding its step, observation and day
+        events, then the result. A run cut short by the budget keeps the days it produced
+        and takes the rest from the local plan; the budget spent is part of the result."""
+        budget = AgentBudget()
+        found: Dict[str, Dict[str, str]] = {}
+        output = None
+        metrics.AGENT_RUNS.labels("react").inc()
+        # Not made current: a generator cannot hold a context variable across its yields
+        run_span = tracing.start_span("agent.run", mode="react")
+        
+        def new_days(text: str) -> Iterator[Dict[str, Any]]:
+            for day, meals in extract_day_menus(text):
+                if day not in found:
+                    found[day] = meals
+                    yield {"event": "day", "data": {"day": day, "meals": meals, "source": "agent"}}
+        
+        try:
+            for step in self._run_agent(self._build_menu_prompt(preferences), budget, run_span):
+                for action, observation in step.get("intermediate_step", []):
+                    yield {"event": "step", "data": {"tool": action.tool, "tool_input": str(action.tool_input), "log": action.log}}
+                    yield {"event": "observation", "data": {"tool": action.tool, "observation": str(observation)}}
+                    yield from new_days(action.log)
+                if "output" in step:
+                    output = step["output"]
+                    yield from new_days(output)
         except Exception as e:
             print(f"Error in agent execution: {e}")
-            return self._fallback_menu_generation(preferences)
+            metrics.MENU_FALLBACKS.labels("agent_error").inc()
+            run_span.error(e)
+        
+        try:
+            partial = self._complete_partial_menu(found, planned, preferences)
+            if output and not budget.stopped:
+                with tracing.span("agent.parse", parent=run_span, response_chars=len(output)) as current:
+                    result = self._parse_agent_response(output, preferences, fallback=partial)
+                    current.set(parsed="agent_response" in result)
+                result = self._store_in_cache(result)
+            else:
+                if budget.stopped:
+                    metrics.MENU_FALLBACKS.labels("budget").inc()
+                result = partial
+            result["budget"] = budget.spent()
+            run_span.set(agent_days=len(found), **budget_attributes(budget))
+        finally:
+            run_span.end()
+        yield {"event": "result", "data": result}
     
-    def _parse_agent_response(self, response: str, preferences: Dict) -> Dict[str, Any]:
+    def _complete_partial_menu(self, found: Dict[str, Dict[str, str]], planned: Dict[str, Any],
+                               preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """The agent's dishes found so far, every other slot filled from the local plan"""
+        if not found:
+            return dict(planned)
+        menu = {day: {} for day in planned["menu"]}
+        used = set()
+        for day, meals in planned["menu"].items():
+            for meal in meals:
+                dish = (found.get(day) or {}).get(meal)
+                if isinstance(dish, str) and dish.strip() and dish.strip().casefold() not in used:
+                    menu[day][meal] = dish.strip()
+                    used.add(dish.strip().casefold())
+        
+        clashes = []
+        for day, meals in planned["menu"].items():
+            for meal, dish in meals.items():
+                if meal in menu[day]:
+                    continue
+                if dish.casefold() in used:
+                    clashes.append((day, meal))
+                used.add(dish.casefold())
+                menu[day][meal] = dish
+        menu = {day: {meal: menu[day][meal] for meal in meals} for day, meals in planned["menu"].items()}
+        if clashes:
+            menu = self.planner.replace(menu, clashes, preferences)["menu"]
+        
+        return {
+            "menu": menu,
+            "preferences_used": preferences,
+            "generated_at": datetime.now().isoformat(),
+            "partial": True,
+            "agent_days": list(found)
+        }
+    
+    async def agenerate_weekly_menu_parallel(self, preferences: Dict[str, Any], planned: Dict[str, Any] = None,
+                                             budget: AgentBudget = None) -> Dict[str, Any]:
+        """Generate the week with one concurrent LLM call per day, then merge.
+        
+        Each day gets a shortlist of candidates from the local dish database.
+        The merge keeps the first occurrence of every dish, re-queries only the
+        slots that clash and finally fills anything left from the local plan.
+        LLM calls beyond the budget fail and their slots are filled locally.
+        """
+        with tracing.span("agent.run", mode="parallel") as run_span:
+            planned = planned or self.plan_weekly_menu(preferences)
+            budget = budget or AgentBudget()
+            metrics.AGENT_RUNS.labels("parallel").inc()
+            days = list(planned["menu"])
+            meals = list(planned["menu"][days[0]]) if days else []
+            diet_type = normalize_key(preferences.get("diet_type") or "veg")
+            cuisines = [normalize_key(c) for c in preferences.get("cuisine") or [] if c and c.strip()] or ["north_indian"]
+            candidates = {meal: self.planner.candidates(cuisines, meal, diet_type, limit=self.planner.slot_candidates)
+                          for meal in meals}
+        
+            def shortlist(meal: str, position: int) -> List[str]:
+                # Hand each day a different slice of the candidates to make clashes unlikely
+                options = candidates[meal]
+                return options[position::len(days)] or options
+        
+            responses = await asyncio.gather(*[
+                self._ask_llm(self._build_day_prompt(preferences, day, {meal: shortlist(meal, i) for meal in meals}), budget)
+                for i, day in enumerate(days)
+            ], return_exceptions=True)
+        
+            menu = {day: {} for day in days}
+            for day, response in zip(days, responses):
+                if isinstance(response, Exception):
+                    print(f"Error generating {day}: {response}")
+                    continue
+                for meal, dish in self._parse_day_response(response, meals).items():
+                    menu[day][meal] = dish
+            agent_days = [day for day in days if menu[day]]
+        
+            used = set()
+            clashes = []
+            for day in days:
+                for meal in meals:
+                    dish = menu[day].get(meal)
+                    if dish and dish.casefold() not in used:
+                        used.add(dish.casefold())
+                    else:
+                        clashes.append((day, meal))
+        
+            for _ in range(MAX_MERGE_ROUNDS):
+                if not clashes:
+                    break
+                reason = budget.exhausted()
+                if reason:
+                    budget.stopped = budget.stopped or reason
+                    break
+                exclude = sorted(used)
+                answers = await asyncio.gather(*[
+                    self._ask_llm(self._build_slot_prompt(preferences, day, meal, candidates[meal], exclude), budget)
+                    for day, meal in clashes
+                ], return_exceptions=True)
+                remaining = []
+                for (day, meal), answer in zip(clashes, answers):
+                    dish = None if isinstance(answer, Exception) else self._parse_slot_response(answer)
+                    if dish and dish.casefold() not in used:
+                        used.add(dish.casefold())
+                        menu[day][meal] = dish
+                    else:
+                        remaining.append((day, meal))
+                clashes = remaining
+        
+            for day, meal in clashes:
+                options = [d for d in candidates[meal] if d.casefold() not in used]
+                dish = options[0] if options else planned["menu"][day][meal]
+                used.add(dish.casefold())
+                menu[day][meal] = dish
+        
+            result = {
+                "menu": {day: {meal: menu[day][meal] for meal in meals} for day in days},
+                "preferences_used": preferences,
+                "generated_at": datetime.now().isoformat(),
+                "parallel": True,
+                "budget": budget.spent()
+            }
+            if agent_days and not budget.stopped:
+                # Marks the week as agent output, which is what gets cached
+                result["agent_response"] = json.dumps([r if isinstance(r, str) else str(r) for r in responses])
+            else:
+                metrics.MENU_FALLBACKS.labels("budget" if budget.stopped else "agent_error").inc()
+                result.update(partial=True, agent_days=agent_days)
+            run_span.set(filled_locally=len(clashes), agent_days=len(agent_days), **budget_attributes(budget))
+            return result
+    
+    async def _ask_llm(self, prompt: str, budget: AgentBudget) -> str:
+        budget.check()
+        budget.charge(llm_calls=1, tokens=estimate_tokens(prompt))
+        try:
+            response = await asyncio.wait_for(self.llm.ainvoke(prompt), timeout=budget.remaining_seconds())
+        except asyncio.TimeoutError:
+            budget.stopped = budget.stopped or "time"
+            raise
+        content = getattr(response, "content", response)
+        budget.charge(tokens=estimate_tokens(str(content)))
+        return content
+    
+    def _build_day_prompt(self, preferences: Dict[str, Any], day: str, options: Dict[str, List[str]]) -> str:
+        option_lines = "\n".join(f"- {meal}: {', '.join(dishes) or 'any suitable dish'}" for meal, dishes in options.items())
+        example = json.dumps({meal: "dish_name" for meal in options})
+        return f"""
+        Plan {day}'s Indian meals with the following preferences:
+        - Diet Type: {preferences.get('diet_type')}
+        - Cuisines: {', '.join(preferences.get('cuisine', []))}
+        - Cooking Time: {preferences.get('cooking_time')}
+        - Health Conditions: {', '.join(preferences.get('health_conditions', []))}
+        
+        Pick one dish per meal, preferably from these options:
+        {option_lines}
+        
+        Reply with only a JSON object like {example}.
+        """
+    
+    def _build_slot_prompt(self, preferences: Dict[str, Any], day: str, meal: str, options: List[str], exclude: List[str]) -> str:
+        return f"""
+        Suggest one Indian {meal} dish for {day} for a {preferences.get('diet_type')} diet from these cuisines: {', '.join(preferences.get('cuisine', []))}.
+        Options: {', '.join(options) or 'any suitable dish'}.
+        It must not be any of: {', '.join(exclude)}.
+        Reply with only the dish name.
+        """
+    
+    def _parse_day_response(self, response: str, meals: List[str]) -> Dict[str, str]:
+        try:
+            data = json.loads(response[response.find('{'):response.rfind('}') + 1])
+        except ValueError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {meal: data[meal].strip() for meal in meals if isinstance(data.get(meal), str) and data[meal].strip()}
+    
+    def _parse_slot_response(self, response: str) -> str:
+        lines = [line.strip().strip('"\'.*-').strip() for line in (response or "").splitlines()]
+        return next((line for line in lines if line), "")
+    
+    def _parse_agent_response(self, response: str, preferences: Dict, fallback: Dict[str, Any] = None) -> Dict[str, Any]:
         """Parse agent response and structure it properly"""
         try:
             start_idx = response.find('{')
@@ -449,11 +962,13 @@ Thought: {agent_scratchpad}
             }
         except Exception as e:
             print(f"Error parsing agent response: {e}")
-            return self._fallback_menu_generation(preferences)
+            metrics.AGENT_PARSE_FAILURES.inc()
+            metrics.MENU_FALLBACKS.labels("parse_failure").inc()
+            return fallback or self._fallback_menu_generation(preferences)
     
     def _fallback_menu_generation(self, preferences: Dict) -> Dict[str, Any]:
-        """Fallback menu generation if agent fails"""
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        """Fallback menu generation if agent fails; callers count the fallback under their reason"""
+        days = DAYS
         fallback_menu = {}
         
         diet_type = preferences.get('diet_type', 'veg')
@@ -461,24 +976,17 @@ Thought: {agent_scratchpad}
         meals = preferences.get('meals', ['breakfast', 'lunch', 'dinner'])
         
         used_dishes = set()
+        candidates = self.tools_handler.get_week_candidates(cuisines, meals, diet_type, days)
         
         for day in days:
             fallback_menu[day] = {}
             for meal in meals:
-                dish_found = False
-                for cuisine in cuisines:
-                    dishes = self.tools_handler.get_dishes_by_criteria(cuisine, meal, diet_type, 20)
-                    # Check if the result is a list and not the "no dishes" string
-                    if isinstance(dishes, list) and dishes:
-                        available_dishes = [dish for dish in dishes if dish not in used_dishes]
-                        if available_dishes:
-                            selected_dish = random.choice(available_dishes)
-                            fallback_menu[day][meal] = selected_dish
-                            used_dishes.add(selected_dish)
-                            dish_found = True
-                            break
-                
-                if not dish_found:
+                available_dishes = [dish for dish in candidates[day][meal] if dish not in used_dishes]
+                if available_dishes:
+                    selected_dish = random.choice(available_dishes)
+                    fallback_menu[day][meal] = selected_dish
+                    used_dishes.add(selected_dish)
+                else:
                     fallback_menu[day][meal] = f"Simple {meal.title()} ({diet_type})"
         
         return {
@@ -487,4 +995,36 @@ Thought: {agent_scratchpad}
             "generated_at": datetime.now().isoformat(),
             "fallback_used": True,
             "message": "Generated using fallback system"
-        }
\ No newline at end of file
+        }
+
+# Process-wide agents keyed by API key: the LLM client (and its HTTP connection
+# pool), tools and prompt are built once and reused by every request
+_shared_agents: Dict[str, IndianMenuAgent] = {}
+_shared_agents_lock = threading.Lock()
+# When to retry initialising the LLM client of a shared agent that has none
+_agent_retry_at: Dict[str, float] = {}
+
+def _needs_new_agent(together_api_key: str, agent: Optional[IndianMenuAgent]) -> bool:
+    if agent is None:
+        return True
+    return agent.llm is None and time.monotonic() >= _agent_retry_at.get(together_api_key, 0.0)
+
+def get_menu_agent(together_api_key: str) -> IndianMenuAgent:
+    """Return the shared IndianMenuAgent for this API key, creating it on first use.
+
+    An agent whose LLM client could not be initialised is replaced after
+    AGENT_RETRY_SECONDS, so a transient failure does not disable the LLM for
+    the life of the process.
+    """
+    agent = _shared_agents.get(together_api_key)
+    if _needs_new_agent(together_api_key, agent):
+        with _shared_agents_lock:
+            agent = _shared_agents.get(together_api_key)
+            if _needs_new_agent(together_api_key, agent):
+                # The dish tools do not depend on the LLM; keep them across retries
+                agent = IndianMenuAgent(together_api_key=together_api_key,
+                                        tools_handler=agent.tools_handler if agent else None)
+                _shared_agents[together_api_key] = agent
+                if agent.llm is None:
+                    _agent_retry_at[together_api_key] = time.monotonic() + AGENT_RETRY_SECONDS
+    return agent
@@ -1,8 +1,14 @@
+import os
+import threading
+import time
+from collections import OrderedDict
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, Optional, Tuple
 from . import models, database
 
 # Constants for JWT
@@ -10,25 +16,81 @@ SECRET_KEY = "your-secret-key-change-this-in-production"  # 🔐 Replace with a
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 120
 
+# Verified-user cache: avoids the user lookup on every authenticated request.
+# Code that updates or deletes a user must call invalidate_user() afterwards
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+# Put the user id in the token so the hot path needs no database round-trip at all;
+# such tokens can then only be revoked through invalidate_user()
+EMBED_USER_ID = os.getenv("AUTH_EMBED_USER_ID", "0") == "1"
+
 # OAuth2 password flow setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def create_access_token(data: dict):
+# token -> (cached at, user fields)
+_user_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+# user id -> time of the last invalidate_user(); tokens issued until then are rejected
+_revoked_before: Dict[int, float] = {}
+
+def create_access_token(data: dict, user_id: Optional[int] = None):
     """
     Create a JWT access token with an expiration time.
     """
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # Sub-second iat, so a token issued right after invalidate_user() is not rejected
+    to_encode.update({"exp": expire, "iat": time.time()})
+    if EMBED_USER_ID and user_id is not None:
+        to_encode["uid"] = user_id
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(
+def invalidate_user(user_id: int):
+    """Forget the cached user and reject every token issued to it so far.
+
+    The hook for paths that update or delete a user: call it after the commit.
+    It takes effect in this process only.
+    """
+    now = time.time()
+    with _user_cache_lock:
+        for token in [token for token, (_, fields) in _user_cache.items() if fields["id"] == user_id]:
+            del _user_cache[token]
+        _revoked_before[user_id] = now
+        # Tokens issued before this cutoff have expired anyway
+        expired = now - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        for revoked in [uid for uid, cutoff in _revoked_before.items() if cutoff < expired]:
+            del _revoked_before[revoked]
+
+def _revoked(user_id: int, payload: Dict[str, Any]) -> bool:
+    cutoff = _revoked_before.get(user_id)
+    return cutoff is not None and payload.get("iat", 0) <= cutoff
+
+def _cached_user(token: str) -> Optional[Dict[str, Any]]:
+    with _user_cache_lock:
+        entry = _user_cache.get(token)
+        if entry is None:
+            return None
+        if entry[0] < time.time() - USER_CACHE_TTL_SECONDS:
+            del _user_cache[token]
+            return None
+        _user_cache.move_to_end(token)
+        return entry[1]
+
+def _cache_user(token: str, fields: Dict[str, Any]):
+    with _user_cache_lock:
+        _user_cache[token] = (time.time(), fields)
+        _user_cache.move_to_end(token)
+        while len(_user_cache) > USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """
-    Decode JWT token and return the current user from DB.
+    Decode JWT token and return the current user, from the token claims or cache when possible, else from DB.
+    Users served without a DB lookup are transient objects carrying id and username.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -44,8 +106,19 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exception
+    if EMBED_USER_ID and payload.get("uid") is not None:
+        if _revoked(payload["uid"], payload):
+            raise credentials_exception
+        return models.User(id=payload["uid"], username=username)
 
-    return user
+    fields = _cached_user(token)
+    if fields is None:
+        user = (await db.execute(select(models.User).where(models.User.username == username))).scalars().first()
+        if user is None:
+            raise credentials_exception
+        fields = {"id": user.id, "username": user.username, "email": user.email}
+        _cache_user(token, fields)
+
+    if _revoked(fields["id"], payload):
+        raise credentials_exception
+    return models.User(**fields)
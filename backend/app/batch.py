@@ -0,0 +1,157 @@
+# batch.py
+"""Off-peak menu pre-generation for every user with saved preferences.
+
+Usage: python -m app.batch [--workers 4] [--processes] [--batch-size 500]
+
+Users with identical preferences share one generated menu. Old active menus
+are deactivated and new ones inserted in batched transactions. The run is
+resumable: the checkpoint file remembers when the run started, and users who
+already received a menu since then are skipped on the next invocation.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import insert, select, update
+
+from . import agents, database, models
+from .main import preferences_from_row, TOGETHER_API_KEY
+from .menu_cache import preferences_key
+from .menus import clean_result, menu_item_rows, new_menu_row, store_response
+
+DEFAULT_CHECKPOINT = "menu_batch_checkpoint.json"
+
+
+def generate_for_preferences(preferences: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate one menu; runs in a worker thread or process"""
+    return agents.get_menu_agent(TOGETHER_API_KEY).generate_weekly_menu(preferences)
+
+
+def load_checkpoint(path: str) -> str:
+    """Return the start time of an interrupted run, or start a new one"""
+    if os.path.exists(path):
+        with open(path) as f:
+            started_at = json.load(f)["started_at"]
+        print(f"Resuming run started at {started_at}")
+        return started_at
+    started_at = datetime.now().isoformat()
+    with open(path, "w") as f:
+        json.dump({"started_at": started_at}, f)
+    return started_at
+
+
+def group_preferences(db, started_at: str, chunk_size: int) -> Dict[str, Dict[str, Any]]:
+    """Stream Preference rows and group user ids by normalised preferences"""
+    done = select(models.WeeklyMenu.user_id).where(
+        models.WeeklyMenu.is_active == 1,
+        models.WeeklyMenu.generated_at >= datetime.fromisoformat(started_at)
+    )
+    rows = db.execute(
+        select(models.Preference)
+        .where(models.Preference.user_id.not_in(done))
+        .order_by(models.Preference.user_id)
+        .execution_options(stream_results=True, yield_per=chunk_size)
+    ).scalars()
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for pref in rows:
+        preferences = preferences_from_row(pref)
+        group = groups.setdefault(preferences_key(preferences), {"preferences": preferences, "user_ids": []})
+        group["user_ids"].append(pref.user_id)
+    return groups
+
+
+def write_menus(db, assignments: List[Tuple[int, Dict[str, Any]]]):
+    """Deactivate old menus and insert new ones for a batch of users in one transaction"""
+    assignments = [(user_id, clean_result(menu_result)) for user_id, menu_result in assignments]
+    user_ids = [user_id for user_id, _ in assignments]
+    db.execute(
+        update(models.WeeklyMenu)
+        .where(models.WeeklyMenu.user_id.in_(user_ids), models.WeeklyMenu.is_active == 1)
+        .values(is_active=0, updated_at=datetime.now())
+    )
+    new_menus = [new_menu_row(user_id, menu_result) for user_id, menu_result in assignments]
+    db.add_all(new_menus)
+    db.flush()
+    for new_menu, (_, menu_result) in zip(new_menus, assignments):
+        store_response(new_menu, menu_result)
+    db.execute(insert(models.MenuItem), [
+        row
+        for new_menu, (_, menu_result) in zip(new_menus, assignments)
+        for row in menu_item_rows(new_menu.id, menu_result["menu"])
+    ])
+    # No cache invalidation: this is a separate process, and the API checks cached
+    # active menus against their version on every read
+    db.commit()
+
+
+def run(workers: int, use_processes: bool, batch_size: int, checkpoint: str) -> Dict[str, Any]:
+    started_at = load_checkpoint(checkpoint)
+    start = time.perf_counter()
+
+    db = database.SessionLocal()
+    try:
+        groups = group_preferences(db, started_at, batch_size)
+    finally:
+        db.close()
+    total_users = sum(len(group["user_ids"]) for group in groups.values())
+    print(f"{total_users} users in {len(groups)} preference groups")
+
+    pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    processed = failed = 0
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    db = database.SessionLocal()
+    try:
+        with pool_class(max_workers=workers) as pool:
+            futures = {pool.submit(generate_for_preferences, group["preferences"]): group for group in groups.values()}
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    menu_result = future.result()
+                except Exception as e:
+                    print(f"Error generating menu for {len(group['user_ids'])} users: {e}")
+                    failed += len(group["user_ids"])
+                    continue
+                pending.extend((user_id, menu_result) for user_id in group["user_ids"])
+                while len(pending) >= batch_size:
+                    write_menus(db, pending[:batch_size])
+                    processed += batch_size
+                    del pending[:batch_size]
+                    elapsed = time.perf_counter() - start
+                    print(f"{processed}/{total_users} users, {processed / elapsed:.1f} users/s")
+        if pending:
+            write_menus(db, pending)
+            processed += len(pending)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - start
+    if not failed:
+        os.remove(checkpoint)
+    summary = {
+        "users": processed,
+        "failed_users": failed,
+        "groups": len(groups),
+        "seconds": round(elapsed, 3),
+        "users_per_second": round(processed / elapsed, 1) if elapsed else 0.0
+    }
+    print(json.dumps(summary))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate next week's menus for all users with preferences")
+    parser.add_argument("--workers", type=int, default=4, help="Number of concurrent generations")
+    parser.add_argument("--processes", action="store_true", help="Use a process pool instead of threads")
+    parser.add_argument("--batch-size", type=int, default=500, help="Users per write transaction and read chunk")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file used to resume an interrupted run")
+    args = parser.parse_args()
+    run(args.workers, args.processes, args.batch_size, args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
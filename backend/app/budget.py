@@ -0,0 +1,118 @@
+# budget.py
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+# Per-request limits for the ReAct agent loop
+AGENT_MAX_SECONDS = float(os.getenv("AGENT_MAX_SECONDS", "30"))
+AGENT_MAX_LLM_CALLS = int(os.getenv("AGENT_MAX_LLM_CALLS", "10"))
+AGENT_MAX_TOKENS = int(os.getenv("AGENT_MAX_TOKENS", "12000"))
+# Observations of all but the latest steps are cut to this many characters in the scratchpad
+AGENT_SCRATCHPAD_OBSERVATION_CHARS = int(os.getenv("AGENT_SCRATCHPAD_OBSERVATION_CHARS", "300"))
+AGENT_SCRATCHPAD_FULL_STEPS = 2
+
+# Rough size of a token for models whose responses carry no usage data
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class BudgetExceeded(Exception):
+    """Raised by an LLM call made after the request's budget ran out"""
+
+
+class AgentBudget:
+    """Wall-clock, LLM call and token allowance of one menu generation.
+
+    The agent loop checks exhausted() after every step and stops early;
+    spent() is reported with the result.
+    """
+
+    def __init__(self, max_seconds: float = AGENT_MAX_SECONDS, max_llm_calls: int = AGENT_MAX_LLM_CALLS,
+                 max_tokens: int = AGENT_MAX_TOKENS):
+        self.max_seconds = max_seconds
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.started = time.monotonic()
+        self.llm_calls = 0
+        self.tokens = 0
+        self.stopped: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.max_seconds - self.elapsed())
+
+    def charge(self, llm_calls: int = 0, tokens: int = 0):
+        with self.lock:
+            self.llm_calls += llm_calls
+            self.tokens += tokens
+
+    def exhausted(self) -> Optional[str]:
+        """Name of the first limit reached, or None"""
+        if self.elapsed() >= self.max_seconds:
+            return "time"
+        if self.llm_calls >= self.max_llm_calls:
+            return "llm_calls"
+        if self.tokens >= self.max_tokens:
+            return "tokens"
+        return None
+
+    def check(self):
+        reason = self.exhausted()
+        if reason:
+            self.stopped = self.stopped or reason
+            raise BudgetExceeded(f"Agent budget exhausted: {reason}")
+
+    def spent(self) -> Dict[str, Any]:
+        return {
+            "seconds": round(self.elapsed(), 3),
+            "llm_calls": self.llm_calls,
+            "tokens": self.tokens,
+            "limits": {"seconds": self.max_seconds, "llm_calls": self.max_llm_calls, "tokens": self.max_tokens},
+            "stopped": self.stopped,
+        }
+
+
+class BudgetCallback(BaseCallbackHandler):
+    """Charges every LLM call of an agent run to its budget"""
+
+    def __init__(self, budget: AgentBudget):
+        self.budget = budget
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any):
+        self.budget.charge(llm_calls=1, tokens=sum(estimate_tokens(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any):
+        text = "".join(str(m.content) for batch in messages for m in batch)
+        self.budget.charge(llm_calls=1, tokens=estimate_tokens(text))
+
+    def on_llm_end(self, response, **kwargs: Any):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("completion_tokens"):
+            self.budget.charge(tokens=usage["completion_tokens"])
+        else:
+            self.budget.charge(tokens=sum(
+                estimate_tokens(generation.text) for generations in response.generations for generation in generations
+            ))
+
+
+def compact_steps(steps: List[Tuple[Any, str]]) -> List[Tuple[Any, str]]:
+    """Shorten old observations so the agent_scratchpad stops growing with every step"""
+    if len(steps) <= AGENT_SCRATCHPAD_FULL_STEPS:
+        return steps
+    cut = len(steps) - AGENT_SCRATCHPAD_FULL_STEPS
+    compacted = []
+    for action, observation in steps[:cut]:
+        observation = str(observation)
+        if len(observation) > AGENT_SCRATCHPAD_OBSERVATION_CHARS:
+            observation = observation[:AGENT_SCRATCHPAD_OBSERVATION_CHARS] + " ...[truncated]"
+        compacted.append((action, observation))
+    return compacted + steps[cut:]
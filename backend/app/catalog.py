@@ -0,0 +1,330 @@
+# catalog.py
+"""Dish catalog stored in SQLite, for catalogs too large for IndianMenuDatabase.
+
+Every record has an id, name, cuisine, meal, diet flags, cooking time,
+grocery ingredients with their categories and nutrition tags. Nothing is
+read until the first lookup. Each thread then opens its own read-only
+connection with the file memory-mapped, so catalog pages sit in the OS page
+cache, shared by all uvicorn workers on the host, instead of being copied
+into every process. Lookups go through the (cuisine, meal) and name indexes
+and are memoised in bounded LRUs.
+
+Set DISH_CATALOG_PATH to serve MenuGenerationTools from a catalog built with
+    python -m app.catalog build catalog.sqlite3 --builtin
+    python -m app.catalog build catalog.sqlite3 --jsonl dishes.jsonl
+where each JSON line is a record such as
+    {"name": "Dal Tadka + Roti", "cuisine": "north_indian", "meal": "lunch",
+     "diets": ["veg", "vegan"], "cooking_minutes": 30,
+     "ingredients": {"Toor Dal": "grains_pulses", "Wheat Flour": "grains_pulses"},
+     "nutrition_tags": ["high_protein", "diabetic_friendly"]}
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Iterator, Optional, Tuple
+
+from .dish_index import ALL_CUISINES, DishIndex, normalize_key
+from .keywords import INGREDIENT_TAG, NUTRITION_TAG
+
+# Empty serves the built-in IndianMenuDatabase
+DISH_CATALOG_PATH = os.getenv("DISH_CATALOG_PATH", "")
+DISH_CATALOG_MMAP_BYTES = int(os.getenv("DISH_CATALOG_MMAP_BYTES", str(256 * 1024 * 1024)))
+# Memoised slot lookups, dish tags and ingredients, each, per process
+DISH_CATALOG_CACHE_SIZE = int(os.getenv("DISH_CATALOG_CACHE_SIZE", "8192"))
+
+DIETS = ("veg", "non_veg", "vegan")
+# Categories of MenuGenerationTools.generate_grocery_list; anything else is filed under "others"
+GROCERY_CATEGORIES = ("vegetables", "grains_pulses", "dairy_proteins", "spices_condiments", "others")
+INSERT_BATCH = 10000
+LIST_SEPARATOR = "|"
+
+SCHEMA = """
+CREATE TABLE dishes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    cuisine TEXT NOT NULL,
+    meal TEXT NOT NULL,
+    veg INTEGER NOT NULL DEFAULT 0,
+    non_veg INTEGER NOT NULL DEFAULT 0,
+    vegan INTEGER NOT NULL DEFAULT 0,
+    cooking_minutes INTEGER,
+    ingredients TEXT NOT NULL DEFAULT '',
+    nutrition_tags TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE ingredients (
+    name TEXT PRIMARY KEY,
+    category TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+INDEXES = """
+CREATE INDEX ix_dishes_slot ON dishes (cuisine, meal);
+CREATE INDEX ix_dishes_meal ON dishes (meal);
+CREATE INDEX ix_dishes_name ON dishes (name);
+"""
+
+
+def split_list(value: str) -> Tuple[str, ...]:
+    return tuple(item for item in value.split(LIST_SEPARATOR) if item) if value else ()
+
+
+class CatalogIndex(DishIndex):
+    """DishIndex over a DishCatalog; each (cuisine, meal, diet) is queried on first use"""
+
+    def __init__(self, catalog: "DishCatalog", cache_size: int = DISH_CATALOG_CACHE_SIZE):
+        self.catalog = catalog
+        self._union = lru_cache(maxsize=cache_size)(self._build_union)
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, cuisine: str, meal: str, diet: str) -> Tuple[str, ...]:
+        cuisine, meal, diet = normalize_key(cuisine), normalize_key(meal), normalize_key(diet)
+        if diet not in DIETS:
+            return ()
+        # diet is one of DIETS, so it is safe to use as a column name
+        if cuisine == ALL_CUISINES:
+            rows = self.catalog.query(f"SELECT name FROM dishes WHERE meal = ? AND {diet} = 1 ORDER BY id", (meal,))
+        else:
+            rows = self.catalog.query(
+                f"SELECT name FROM dishes WHERE cuisine = ? AND meal = ? AND {diet} = 1 ORDER BY id", (cuisine, meal)
+            )
+        return tuple(dict.fromkeys(name for name, in rows))
+
+    def union(self, cuisines: Iterable[str], meal: str, diet: str) -> Tuple[str, ...]:
+        """Deduplicated dishes across several cuisines, in cuisine order.
+
+        Unknown cuisines need no filtering here: their lookups come back empty.
+        """
+        return self._union(tuple(normalize_key(c) for c in cuisines), normalize_key(meal), normalize_key(diet))
+
+
+class CatalogTagger:
+    """Same tags() as KeywordMatcher, read from the catalog record of the dish.
+
+    Dishes missing from the catalog, such as ones the LLM came up with, are
+    tagged by the fallback keyword matcher when one is given.
+    """
+
+    def __init__(self, catalog: "DishCatalog", fallback=None, cache_size: int = DISH_CATALOG_CACHE_SIZE):
+        self.catalog = catalog
+        self.fallback = fallback
+        self.tags = lru_cache(maxsize=cache_size)(self._tags)
+
+    def _tags(self, text: str) -> FrozenSet[Hashable]:
+        rows = self.catalog.query("SELECT nutrition_tags, ingredients FROM dishes WHERE name = ? LIMIT 1", (text,))
+        if not rows:
+            return self.fallback.tags(text) if self.fallback else frozenset()
+        nutrition, ingredients = rows[0]
+        categories = self.catalog.NUTRITIONAL_BALANCE
+        return frozenset(
+            [(NUTRITION_TAG, tag) for tag in split_list(nutrition) if tag in categories]
+            + [(INGREDIENT_TAG, item) for item in split_list(ingredients)]
+        )
+
+
+class CatalogIngredients(Mapping):
+    """INGREDIENT_MAPPING view of the catalog: ingredient -> (grocery category, [ingredient])"""
+
+    def __init__(self, catalog: "DishCatalog", fallback: Mapping = None, cache_size: int = DISH_CATALOG_CACHE_SIZE):
+        self.catalog = catalog
+        self.fallback = fallback or {}
+        self.category = lru_cache(maxsize=cache_size)(self._category)
+
+    def _category(self, name: str) -> Optional[str]:
+        rows = self.catalog.query("SELECT category FROM ingredients WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def __getitem__(self, name: str) -> Tuple[str, list]:
+        category = self.category(name)
+        if category is not None:
+            return category, [name]
+        return self.fallback[name]
+
+    def __iter__(self) -> Iterator[str]:
+        for name, in self.catalog.query("SELECT name FROM ingredients"):
+            yield name
+        yield from self.fallback
+
+    def __len__(self) -> int:
+        return self.catalog.query("SELECT COUNT(*) FROM ingredients")[0][0] + len(self.fallback)
+
+
+class DishCatalog:
+    """Read-only dish catalog in a SQLite file, usable as MenuGenerationTools' database.
+
+    Provides the NUTRITIONAL_BALANCE and INGREDIENT_MAPPING of IndianMenuDatabase
+    plus a DishIndex-compatible index and a KeywordMatcher-compatible tagger.
+    fallback_tagger and fallback_ingredients cover dishes not in the catalog.
+    """
+
+    def __init__(self, path: str, nutritional_balance: Mapping, fallback_tagger=None,
+                 fallback_ingredients: Mapping = None, cache_size: int = DISH_CATALOG_CACHE_SIZE):
+        self.path = path
+        self.NUTRITIONAL_BALANCE = nutritional_balance
+        self.INGREDIENT_MAPPING = CatalogIngredients(self, fallback_ingredients, cache_size)
+        self.index = CatalogIndex(self, cache_size)
+        self.tagger = CatalogTagger(self, fallback_tagger, cache_size)
+        self.local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(Path(self.path).resolve().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {DISH_CATALOG_MMAP_BYTES}")
+            # Reads are served from the shared mapping; keep the private page cache small
+            conn.execute("PRAGMA cache_size = -1024")
+            self.local.conn = conn
+        return conn
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        return self.connection().execute(sql, params).fetchall()
+
+    def dish(self, name: str) -> Optional[Dict[str, Any]]:
+        """Full record of the first dish with this name"""
+        rows = self.query(
+            "SELECT id, name, cuisine, meal, veg, non_veg, vegan, cooking_minutes, ingredients, nutrition_tags "
+            "FROM dishes WHERE name = ? ORDER BY id LIMIT 1", (name,)
+        )
+        if not rows:
+            return None
+        dish_id, name, cuisine, meal, veg, non_veg, vegan, cooking_minutes, ingredients, nutrition = rows[0]
+        items = split_list(ingredients)
+        return {
+            "id": dish_id,
+            "name": name,
+            "cuisine": cuisine,
+            "meal": meal,
+            "diets": [diet for diet, flag in zip(DIETS, (veg, non_veg, vegan)) if flag],
+            "cooking_minutes": cooking_minutes,
+            "ingredients": {item: self.INGREDIENT_MAPPING.category(item) for item in items},
+            "nutrition_tags": list(split_list(nutrition)),
+        }
+
+    def __len__(self) -> int:
+        return self.query("SELECT COUNT(*) FROM dishes")[0][0]
+
+
+def open_catalog(path: str, nutritional_balance: Mapping, fallback_tagger=None,
+                 fallback_ingredients: Mapping = None) -> Optional[DishCatalog]:
+    """The catalog at path, or None (with a warning) when there is no such file"""
+    if not path:
+        return None
+    if not os.path.exists(path):
+        print(f"Warning: dish catalog {path} not found, using the built-in dishes")
+        return None
+    return DishCatalog(path, nutritional_balance, fallback_tagger, fallback_ingredients)
+
+
+def catalog_row(record: Dict[str, Any]) -> Tuple:
+    diets = {normalize_key(diet) for diet in record.get("diets") or []}
+    ingredients = record.get("ingredients") or {}
+    if not isinstance(ingredients, dict):
+        ingredients = {item: "others" for item in ingredients}
+    minutes = record.get("cooking_minutes")
+    return (
+        record["name"].strip(),
+        normalize_key(record["cuisine"]),
+        normalize_key(record["meal"]),
+        *(int(diet in diets) for diet in DIETS),
+        int(minutes) if minutes is not None else None,
+        LIST_SEPARATOR.join(ingredients),
+        LIST_SEPARATOR.join(normalize_key(tag) for tag in record.get("nutrition_tags") or []),
+    ), ingredients
+
+
+def build_catalog(path: str, records: Iterable[Dict[str, Any]]) -> int:
+    """Write records to a new catalog file that replaces path atomically; returns the dish count"""
+    tmp_path = f"{path}.building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    count = 0
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+        categories: Dict[str, str] = {}
+        batch = []
+        for record in records:
+            row, ingredients = catalog_row(record)
+            batch.append(row)
+            for item, category in ingredients.items():
+                categories.setdefault(item, category if category in GROCERY_CATEGORIES else "others")
+            if len(batch) >= INSERT_BATCH:
+                count += _insert(conn, batch)
+                batch = []
+        count += _insert(conn, batch)
+        conn.executemany("INSERT INTO ingredients (name, category) VALUES (?, ?)", categories.items())
+        conn.executescript(INDEXES)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def _insert(conn: sqlite3.Connection, rows: list) -> int:
+    conn.executemany(
+        "INSERT INTO dishes (name, cuisine, meal, veg, non_veg, vegan, cooking_minutes, ingredients, nutrition_tags) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+    )
+    return len(rows)
+
+
+def records_from_database(database, tagger) -> Iterator[Dict[str, Any]]:
+    """Catalog records for an IndianMenuDatabase-style dict, with its keyword guesses written down"""
+    for cuisine, meals in database.DISHES.items():
+        for meal, diets in meals.items():
+            dish_diets: Dict[str, list] = {}
+            for diet, names in diets.items():
+                for name in names:
+                    dish_diets.setdefault(name, []).append(diet)
+            for name, found_diets in dish_diets.items():
+                tags = tagger.tags(name)
+                ingredients = {}
+                for namespace, keyword in sorted(tags, key=str):
+                    if namespace == INGREDIENT_TAG:
+                        category, items = database.INGREDIENT_MAPPING[keyword]
+                        ingredients.update((item, category) for item in items)
+                yield {
+                    "name": name,
+                    "cuisine": cuisine,
+                    "meal": meal,
+                    "diets": found_diets,
+                    "cooking_minutes": None,
+                    "ingredients": ingredients,
+                    "nutrition_tags": sorted(tag for namespace, tag in tags if namespace == NUTRITION_TAG),
+                }
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a SQLite dish catalog for DISH_CATALOG_PATH")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Write a catalog file")
+    build.add_argument("path")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--builtin", action="store_true", help="From IndianMenuDatabase, tags guessed by keyword")
+    source.add_argument("--jsonl", help="From a file with one JSON record per line")
+    args = parser.parse_args()
+
+    if args.builtin:
+        from .agents import DISH_TAGGER, IndianMenuDatabase
+        records = records_from_database(IndianMenuDatabase, DISH_TAGGER)
+    else:
+        records = read_jsonl(args.jsonl)
+    print(f"Wrote {build_catalog(args.path, records)} dishes to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# dish_index.py
+import random
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Iterable, Mapping, Optional, Sequence, Tuple
+
+ALL_CUISINES = "*"
+# Memoised multi-cuisine unions per index
+UNION_CACHE_SIZE = 1024
+
+
+def normalize_key(value: str) -> str:
+    """Normalise a cuisine/meal/diet value from the frontend ('non-veg') to a database key ('non_veg')"""
+    return value.strip().lower().replace("-", "_").replace(" ", "_") if value else ""
+
+
+def split_cuisines(cuisine: str) -> Tuple[str, ...]:
+    """Split a comma-separated cuisine string into normalised keys"""
+    return tuple(normalize_key(c) for c in cuisine.split(",") if c.strip())
+
+
+class DishIndex:
+    """Immutable lookup index over a nested {cuisine: {meal: {diet: [dishes]}}} dict.
+
+    Built once; every (cuisine, meal, diet) key holds a deduplicated tuple and
+    (ALL_CUISINES, meal, diet) holds the union across all cuisines. Unions over a
+    particular set of cuisines are computed on first use and memoised in a
+    bounded LRU; cuisines the index does not know add no dishes and are left
+    out of the key, so arbitrary cuisine strings cannot grow the memo.
+    """
+
+    def __init__(self, dishes: Mapping[str, Mapping[str, Mapping[str, Sequence[str]]]]):
+        index = {}
+        across = {}
+        for cuisine, meals in dishes.items():
+            for meal, diets in meals.items():
+                for diet, names in diets.items():
+                    key = (normalize_key(cuisine), normalize_key(meal), normalize_key(diet))
+                    index[key] = tuple(dict.fromkeys(index.get(key, ()) + tuple(names)))
+                    across.setdefault((normalize_key(meal), normalize_key(diet)), []).extend(names)
+        for (meal, diet), names in across.items():
+            index[(ALL_CUISINES, meal, diet)] = tuple(dict.fromkeys(names))
+
+        self._index = MappingProxyType(index)
+        self.cuisines = frozenset(cuisine for cuisine, _, _ in index if cuisine != ALL_CUISINES)
+        self._union = lru_cache(maxsize=UNION_CACHE_SIZE)(self._build_union)
+
+    def lookup(self, cuisine: str, meal: str, diet: str) -> Tuple[str, ...]:
+        """Dishes for a single cuisine, meal and diet"""
+        return self._index.get((normalize_key(cuisine), normalize_key(meal), normalize_key(diet)), ())
+
+    def union(self, cuisines: Iterable[str], meal: str, diet: str) -> Tuple[str, ...]:
+        """Deduplicated dishes across several cuisines, in cuisine order"""
+        known = tuple(c for c in (normalize_key(c) for c in cuisines) if c in self.cuisines or c == ALL_CUISINES)
+        return self._union(known, normalize_key(meal), normalize_key(diet))
+
+    def _build_union(self, cuisines: Tuple[str, ...], meal: str, diet: str) -> Tuple[str, ...]:
+        if len(cuisines) == 1:
+            return self.lookup(cuisines[0], meal, diet)
+        return tuple(dict.fromkeys(d for c in cuisines for d in self.lookup(c, meal, diet)))
+
+    def sample(self, cuisines: Iterable[str], meal: str, diet: str, count: int,
+               rng: Optional[random.Random] = None) -> List[str]:
+        """Random sample of up to count dishes without copying the underlying tuple"""
+        pool = self.union(cuisines, meal, diet)
+        picks = (rng or random).sample(range(len(pool)), min(count, len(pool)))
+        return [pool[i] for i in picks]
+
+    def week_candidates(self, cuisines: Iterable[str], meals: Iterable[str], diet: str,
+                        days: Iterable[str]) -> Dict[str, Dict[str, Tuple[str, ...]]]:
+        """Candidate dishes for the whole days x meals grid in one call"""
+        cuisines = tuple(cuisines)
+        per_meal = {meal: self.union(cuisines, meal, diet) for meal in meals}
+        return {day: dict(per_meal) for day in days}
@@ -0,0 +1,36 @@
+# fastjson.py
+import json
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    print("Warning: orjson is not installed, menu responses use the slower json module")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, with orjson when it is available"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class MenuJSONResponse(Response):
+    """JSON response rendered with dumps(); str or bytes content is sent as-is, already encoded"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, str):
+            return content.encode("utf-8")
+        return dumps(content)
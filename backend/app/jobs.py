@@ -0,0 +1,179 @@
+# jobs.py
+import contextvars
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Set
+
+from sqlalchemy import delete, func, select, update
+
+from . import database, models
+
+# Worker pool sizing for background menu generation
+MENU_JOB_WORKERS = int(os.getenv("MENU_JOB_WORKERS", "4"))
+MENU_JOB_QUEUE_DEPTH = int(os.getenv("MENU_JOB_QUEUE_DEPTH", "32"))
+MENU_JOB_RETENTION_SECONDS = int(os.getenv("MENU_JOB_RETENTION_SECONDS", "3600"))
+# Unfinished jobs older than this were lost with the process running them
+MENU_JOB_STALE_SECONDS = int(os.getenv("MENU_JOB_STALE_SECONDS", "900"))
+
+UNFINISHED = ("queued", "running")
+LOST_ERROR = "Job was lost when its server stopped, submit it again"
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue already holds the maximum number of jobs"""
+
+
+def job_dict(job: models.MenuJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "owner": job.user_id,
+        "status": job.status,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobQueue:
+    """Bounded background job runner with job state in the menu_jobs table.
+
+    Jobs run on a dedicated thread pool, separate from the request threadpool,
+    so slow work cannot starve other endpoints. At most max_workers jobs run
+    and max_queued wait in this process; further submissions raise
+    QueueFullError. Job rows are shared by every replica, so a job can be
+    polled through any of them and outlives restarts. An unfinished job older
+    than stale_seconds is reported as failed: the process running it is gone.
+    Finished jobs are deleted after retention_seconds.
+    """
+
+    def __init__(self, max_workers: int = MENU_JOB_WORKERS, max_queued: int = MENU_JOB_QUEUE_DEPTH,
+                 retention_seconds: int = MENU_JOB_RETENTION_SECONDS, stale_seconds: int = MENU_JOB_STALE_SECONDS,
+                 session_factory: Callable = database.SessionLocal):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="menu-job")
+        self.slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self.retention_seconds = retention_seconds
+        self.stale_seconds = stale_seconds
+        self.session_factory = session_factory
+        # Jobs of this process that have not started; failed on shutdown
+        self.pending: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def submit(self, owner: int, fn: Callable[..., Any], *args) -> Dict[str, Any]:
+        """Queue fn(*args) for owner; an owner's unfinished job is returned instead of queueing a duplicate"""
+        self._prune()
+        with self.session_factory() as db:
+            existing = db.execute(
+                select(models.MenuJob)
+                .where(models.MenuJob.user_id == owner, models.MenuJob.status.in_(UNFINISHED),
+                       models.MenuJob.created_at >= self._stale_cutoff())
+                .order_by(models.MenuJob.created_at.desc())
+            ).scalars().first()
+            if existing:
+                return job_dict(existing)
+
+            if not self.slots.acquire(blocking=False):
+                raise QueueFullError("Too many menu generation jobs in progress, try again later")
+            try:
+                job = models.MenuJob(id=uuid.uuid4().hex, user_id=owner, status="queued", created_at=datetime.now())
+                db.add(job)
+                db.commit()
+            except Exception:
+                self.slots.release()
+                raise
+            snapshot = job_dict(job)
+
+        job_id = snapshot["job_id"]
+        with self.lock:
+            self.pending.add(job_id)
+        try:
+            # Run in a copy of the submitter's context, so the job's spans join its trace
+            self.executor.submit(contextvars.copy_context().run, self._run, job_id, fn, *args)
+        except RuntimeError:
+            # Executor already shut down
+            self.slots.release()
+            with self.lock:
+                self.pending.discard(job_id)
+            self._update(job_id, status="failed", error="Job queue is shutting down")
+            raise QueueFullError("Job queue is shutting down")
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.session_factory() as db:
+            job = db.get(models.MenuJob, job_id)
+        if job is None:
+            return None
+        if job.finished_at and job.finished_at < datetime.now() - timedelta(seconds=self.retention_seconds):
+            return None
+        result = job_dict(job)
+        if job.status in UNFINISHED and job.created_at < self._stale_cutoff():
+            result.update(status="failed", error=LOST_ERROR)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self.session_factory() as db:
+            counts = dict(db.execute(
+                select(models.MenuJob.status, func.count()).group_by(models.MenuJob.status)
+            ).all())
+        return {status: counts.get(status, 0) for status in ("queued", "running", "completed", "failed")}
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        # Queued jobs were cancelled; fail them now rather than leaving them to go stale
+        with self.lock:
+            cancelled, self.pending = self.pending, set()
+        for job_id in cancelled:
+            try:
+                self._update(job_id, status="failed", error=LOST_ERROR)
+            except Exception as e:
+                print(f"Error failing cancelled job {job_id}: {e}")
+
+    def _run(self, job_id: str, fn: Callable[..., Any], *args):
+        with self.lock:
+            if job_id not in self.pending:
+                # Failed by shutdown() before it started
+                self.slots.release()
+                return
+            self.pending.discard(job_id)
+        try:
+            self._update(job_id, status="running")
+            result = fn(*args)
+            self._update(job_id, status="completed", result=json.dumps(result, default=str))
+        except Exception as e:
+            print(f"Error in background job {job_id}: {e}")
+            try:
+                self._update(job_id, status="failed", error=str(e))
+            except Exception as update_error:
+                print(f"Error recording failure of job {job_id}: {update_error}")
+        finally:
+            self.slots.release()
+        self._prune()
+
+    def _update(self, job_id: str, **fields):
+        if fields.get("status") in ("completed", "failed"):
+            fields["finished_at"] = datetime.now()
+        with self.session_factory() as db:
+            db.execute(update(models.MenuJob).where(models.MenuJob.id == job_id).values(**fields))
+            db.commit()
+
+    def _stale_cutoff(self) -> datetime:
+        return datetime.now() - timedelta(seconds=self.stale_seconds)
+
+    def _prune(self):
+        cutoff = datetime.now() - timedelta(seconds=self.retention_seconds)
+        try:
+            with self.session_factory() as db:
+                db.execute(delete(models.MenuJob).where(models.MenuJob.finished_at < cutoff))
+                db.execute(delete(models.MenuJob).where(
+                    models.MenuJob.status.in_(UNFINISHED), models.MenuJob.created_at < cutoff - timedelta(seconds=self.stale_seconds)
+                ))
+                db.commit()
+        except Exception as e:
+            print(f"Error pruning finished jobs: {e}")
+
+
+menu_jobs = JobQueue()
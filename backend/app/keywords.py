@@ -0,0 +1,51 @@
+# keywords.py
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Hashable, Iterable, Mapping, Set
+
+# Label namespaces used when tagging dish names
+NUTRITION_TAG = "nutrition"
+INGREDIENT_TAG = "ingredient"
+
+
+class KeywordMatcher:
+    """Multi-keyword substring matcher compiled once into a single regex.
+
+    Each label maps to a list of keywords; tags(text) returns every label with
+    at least one keyword contained in text, with the same semantics as
+    `any(keyword in text for keyword in keywords)` but in a single scan.
+    Results are cached per text, so repeated dish names cost a dict lookup.
+    """
+
+    def __init__(self, groups: Mapping[Hashable, Iterable[str]], cache_size: int = 8192):
+        self.labels_by_keyword: Dict[str, Set[Hashable]] = {}
+        for label, keywords in groups.items():
+            for keyword in keywords:
+                if keyword:
+                    self.labels_by_keyword.setdefault(keyword, set()).add(label)
+
+        keywords = sorted(self.labels_by_keyword, key=len, reverse=True)
+        # A zero-width lookahead tries every start position, so overlapping
+        # keywords are found; the longest keyword wins at each position and the
+        # keywords it contains are added back from `contained`
+        self.pattern = re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))") if keywords else None
+        self.contained = {
+            keyword: frozenset(other for other in keywords if other in keyword)
+            for keyword in keywords
+        }
+
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+        self.tags = lru_cache(maxsize=cache_size)(self._tags)
+
+    def _match(self, text: str) -> FrozenSet[str]:
+        """All keywords contained in text"""
+        if not self.pattern or not text:
+            return frozenset()
+        found = set()
+        for m in self.pattern.finditer(text):
+            found |= self.contained[m.group(1)]
+        return frozenset(found)
+
+    def _tags(self, text: str) -> FrozenSet[Hashable]:
+        """All labels with at least one keyword contained in text"""
+        return frozenset(label for keyword in self.match(text) for label in self.labels_by_keyword[keyword])
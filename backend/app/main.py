@@ -1,15 +1,28 @@
 # main.py - CORRECTED VERSION
-import json
-from fastapi import FastAPI, Depends, HTTPException
+import hashlib
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import agents
-from . import models, schema, utils, database, auth
+from . import models, schema, utils, database, auth, jobs, fastjson, metrics, tracing
+from .fastjson import MenuJSONResponse
+from .menus import (
+    save_weekly_menu, save_weekly_menu_async, load_previews, set_menu_slots, stored_response,
+    menu_response_json, menu_etag, http_date
+)
+from .state_cache import ACTIVE_MENU, PREFERENCES, state_cache
 
 import os
 
-models.Base.metadata.create_all(bind=database.engine)
+# Largest page /menu-history will return
+MAX_HISTORY_PAGE = int(os.getenv("MAX_HISTORY_PAGE", "50"))
+
 app = FastAPI()
 
 # CORS middleware
@@ -20,44 +33,85 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
 
-# Dependency
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Dependency: the same callable as auth.get_current_user uses, so FastAPI
+# resolves it once and each request holds at most one session
+get_db = database.get_async_db
+
+@app.on_event("startup")
+async def create_tables():
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
 
+@app.on_event("shutdown")
+def shutdown_jobs():
+    jobs.menu_jobs.shutdown(wait=False)
+
+@app.exception_handler(utils.HashingBusyError)
+def hashing_busy_handler(request: Request, exc: utils.HashingBusyError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+# bcrypt runs on the dedicated hashing executor instead of the event loop
 @app.post("/register")
-def register(user: schema.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def register(user: schema.UserCreate, db: AsyncSession = Depends(get_db)):
+    existing_user = (await db.execute(select(models.User).where(models.User.username == user.username))).scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    existing_email = db.query(models.User).filter(models.User.email == user.email).first()
+    existing_email = (await db.execute(select(models.User).where(models.User.email == user.email))).scalars().first()
     if existing_email:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = utils.hash_password(user.password)
+    hashed_password = await utils.hash_password_async(user.password)
     db_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return {"msg": "User registered successfully"}
 
 @app.post("/login", response_model=schema.Token)
-def login(user: schema.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if not db_user or not utils.verify_password(user.password, db_user.hashed_password):
+async def login(user: schema.UserLogin, db: AsyncSession = Depends(get_db)):
+    db_user = (await db.execute(select(models.User).where(models.User.username == user.username))).scalars().first()
+    if not db_user:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    valid, new_hash = await utils.verify_and_update_password_async(user.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+    if new_hash:
+        # Transparent rehash when BCRYPT_ROUNDS changed
+        db_user.hashed_password = new_hash
+        await db.commit()
         
-    token = auth.create_access_token(data={"sub": db_user.username})
+    token = auth.create_access_token(data={"sub": db_user.username}, user_id=db_user.id)
     return {"access_token": token, "token_type": "bearer"}
 
+async def get_preference_row(db: AsyncSession, user_id: int) -> models.Preference:
+    return (await db.execute(select(models.Preference).where(models.Preference.user_id == user_id))).scalars().first()
+
+async def load_preferences(db: AsyncSession, user_id: int) -> Optional[dict]:
+    """Parsed preferences of a user, read through the state cache.
+
+    Like load_active_menu, the cached copy is only served while it has the
+    row's current version, so saves made through other replicas are seen.
+    """
+    version = (await db.execute(
+        select(models.Preference.version).where(models.Preference.user_id == user_id)
+    )).first()
+    if not version:
+        return None
+    version = version[0] or 1
+
+    async def load():
+        pref = await get_preference_row(db, user_id)
+        return {"version": pref.version or 1, "preferences": preferences_from_row(pref)} if pref else None
+    cached = await state_cache.get_or_load(PREFERENCES, user_id, load,
+                                           valid=lambda cached: cached.get("version") == version)
+    return cached["preferences"] if cached else None
+
 @app.post("/preferences")
-def save_preferences(pref: schema.PreferenceCreate, db: Session = Depends(get_db), user: models.User = Depends(auth.get_current_user)):
-    existing = db.query(models.Preference).filter(models.Preference.user_id == user.id).first()
+async def save_preferences(pref: schema.PreferenceCreate, db: AsyncSession = Depends(get_db), user: models.User = Depends(auth.get_current_user)):
+    existing = await get_preference_row(db, user.id)
 
     pref_data = {
         "diet_type": pref.diet_type,
@@ -70,30 +124,37 @@ def save_preferences(pref: schema.PreferenceCreate, db: Session = Depends(get_db
     if existing:
         for key, value in pref_data.items():
             setattr(existing, key, value)
+        existing.version = func.coalesce(models.Preference.version, 1) + 1
     else:
         new_pref = models.Preference(user_id=user.id, **pref_data)
         db.add(new_pref)
 
-    db.commit()
+    await db.commit()
+    state_cache.invalidate(PREFERENCES, user.id)
     return {"msg": "Preferences saved successfully"}
 
 @app.get("/preferences", response_model=schema.PreferenceCreate)
-def get_preferences(db: Session = Depends(get_db), user: models.User = Depends(auth.get_current_user)):
-    pref = db.query(models.Preference).filter(models.Preference.user_id == user.id).first()
-    if not pref:
+async def get_preferences(db: AsyncSession = Depends(get_db), user: models.User = Depends(auth.get_current_user)):
+    preferences = await load_preferences(db, user.id)
+    if not preferences:
         raise HTTPException(status_code=404, detail="Preferences not found")
 
     return schema.PreferenceCreate(
-        diet_type=pref.diet_type or "",
-        cuisine=pref.cuisine.split(",") if pref.cuisine else [],
-        meals=pref.meals.split(",") if pref.meals else [],
-        cooking_time=pref.cooking_time or "",
-        health_conditions=pref.health_conditions.split(",") if pref.health_conditions else [],
+        diet_type=preferences["diet_type"] or "",
+        cuisine=[c for c in preferences["cuisine"] if c],
+        meals=[m for m in preferences["meals"] if m],
+        cooking_time=preferences["cooking_time"] or "",
+        health_conditions=[h for h in preferences["health_conditions"] if h],
     )
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    content, content_type = metrics.render_latest()
+    return Response(content=content, headers={"Content-Type": content_type})
+
 # Optional: Add a protected endpoint for testing
 @app.get("/protected")
-def get_protected_data(user: models.User = Depends(auth.get_current_user)):
+async def get_protected_data(user: models.User = Depends(auth.get_current_user)):
     return {
         "message": "This is protected data", 
         "user": user.username,
@@ -105,13 +166,8 @@ TOGETHER_API_KEY = "tgp_v1_3L1Gq3VKiuALrOxkGgBUe9sRPnZWVSx8gcL18coxquI"
 # Also, set it as an environment variable for LangChain's convenience
 os.environ["TOGETHER_API_KEY"] = TOGETHER_API_KEY
 
-@app.post("/generate-menu", response_model=schema.MenuResponse)
-def generate_menu(req: schema.MenuGenerateRequest, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    pref = db.query(models.Preference).filter(models.Preference.user_id == current_user.id).first()
-    if not pref:
-        raise HTTPException(status_code=400, detail="Set preferences before generating menu")
-
-    preferences = {
+def preferences_from_row(pref: models.Preference) -> dict:
+    return {
         "diet_type": pref.diet_type,
         "cuisine": pref.cuisine.split(","),
         "meals": pref.meals.split(","),
@@ -119,82 +175,256 @@ def generate_menu(req: schema.MenuGenerateRequest, current_user: models.User = D
         "health_conditions": pref.health_conditions.split(",")
     }
 
-    agent = agents.IndianMenuAgent(together_api_key=TOGETHER_API_KEY)
-    menu_result = agent.generate_weekly_menu(preferences)
+@app.post("/generate-menu", response_model=schema.MenuResponse, response_class=MenuJSONResponse)
+async def generate_menu(req: schema.MenuGenerateRequest, current_user: models.User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    preferences = await load_preferences(db, current_user.id)
+    if not preferences:
+        raise HTTPException(status_code=400, detail="Set preferences before generating menu")
+
+    # End the read transaction so no pooled connection is held while the menu is generated
+    await db.commit()
+
+    agent = agents.get_menu_agent(TOGETHER_API_KEY)
+    menu_result = await run_in_threadpool(agent.generate_weekly_menu, preferences)
+
+    new_menu = await save_weekly_menu_async(db, current_user.id, menu_result)
+    return MenuJSONResponse(new_menu.response_json)
+
+def sse_event(event: str, data) -> str:
+    """SSE frame for a dict, or for a JSON string that is already encoded"""
+    payload = data if isinstance(data, str) else fastjson.dumps(data).decode()
+    return f"event: {event}\ndata: {payload}\n\n"
+
+def stream_menu_events(user_id: int, preferences: dict):
+    agent = agents.get_menu_agent(TOGETHER_API_KEY)
+    try:
+        for item in agent.stream_weekly_menu(preferences):
+            if item["event"] != "result":
+                yield sse_event(item["event"], item["data"])
+                continue
+
+            menu_result = item["data"]
+            db = database.SessionLocal()
+            try:
+                body = save_weekly_menu(db, user_id, menu_result).response_json
+            finally:
+                db.close()
+            yield sse_event("done", body)
+    except Exception as e:
+        print(f"Error streaming menu generation: {e}")
+        yield sse_event("error", {"detail": "Menu generation failed"})
+
+@app.post("/generate-menu/stream")
+async def generate_menu_stream(req: schema.MenuGenerateRequest, current_user: models.User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    preferences = await load_preferences(db, current_user.id)
+    if not preferences:
+        raise HTTPException(status_code=400, detail="Set preferences before generating menu")
 
-    # Deactivate previous menu
-    db.query(models.WeeklyMenu).filter(models.WeeklyMenu.user_id == current_user.id, models.WeeklyMenu.is_active == 1).update({"is_active": 0})
+    # get_db is only closed after the stream ends: release the pooled connection now
+    await db.commit()
 
-    new_menu = models.WeeklyMenu(
-        user_id=current_user.id,
-        menu_data=json.dumps(menu_result["menu"]),
-        generation_prompt=json.dumps(menu_result["preferences_used"]),
-        created_at=menu_result["generated_at"],
-        is_active=1
+    return StreamingResponse(
+        stream_menu_events(current_user.id, preferences),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    db.add(new_menu)
-    db.commit()
-    db.refresh(new_menu)
 
+def run_menu_job(user_id: int, preferences: dict) -> dict:
+    """Generate and store a menu on a job worker, using its own DB session"""
+    with tracing.span("menu.job", user_id=user_id):
+        agent = agents.get_menu_agent(TOGETHER_API_KEY)
+        menu_result = agent.generate_weekly_menu(preferences)
+
+        db = database.SessionLocal()
+        try:
+            return fastjson.loads(save_weekly_menu(db, user_id, menu_result).response_json)
+        finally:
+            db.close()
+
+def job_response(job: dict) -> dict:
     return {
-        "menu": menu_result["menu"],
-        "preferences_used": menu_result["preferences_used"],
-        "generated_at": menu_result["generated_at"],
-        "menu_id": new_menu.id
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "result": job["result"]
     }
 
-@app.get("/current-menu", response_model=schema.MenuResponse)
-def get_current_menu(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    menu = db.query(models.WeeklyMenu).filter(models.WeeklyMenu.user_id == current_user.id, models.WeeklyMenu.is_active == 1).first()
-    if not menu:
+@app.post("/generate-menu/jobs", response_model=schema.MenuJobResponse, response_class=MenuJSONResponse, status_code=202)
+async def submit_menu_job(req: schema.MenuGenerateRequest, current_user: models.User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    preferences = await load_preferences(db, current_user.id)
+    if not preferences:
+        raise HTTPException(status_code=400, detail="Set preferences before generating menu")
+
+    try:
+        job = await run_in_threadpool(jobs.menu_jobs.submit, current_user.id, run_menu_job, current_user.id, preferences)
+    except jobs.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return job_response(job)
+
+@app.get("/generate-menu/jobs/{job_id}", response_model=schema.MenuJobResponse, response_class=MenuJSONResponse)
+async def get_menu_job(job_id: str, current_user: models.User = Depends(auth.get_current_user)):
+    # Job rows are shared, so any replica can answer for a job another one runs
+    job = await run_in_threadpool(jobs.menu_jobs.get, job_id)
+    if not job or job["owner"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+async def load_active_menu(db: AsyncSession, user_id: int) -> Optional[dict]:
+    """The user's active menu as served by /current-menu, read through the state cache.
+
+    A small query for the active menu's id and version comes first; the cached
+    copy is only served when it has that id and version, so menus written by
+    other replicas or the batch command are picked up on the next request.
+    """
+    current = (await db.execute(
+        select(models.WeeklyMenu.id, models.WeeklyMenu.version)
+        .where(models.WeeklyMenu.user_id == user_id, models.WeeklyMenu.is_active == 1)
+    )).first()
+    if not current:
+        return None
+    version = current.version or 1
+
+    async def load():
+        row = (await db.execute(
+            select(
+                models.WeeklyMenu.id, models.WeeklyMenu.response_json, models.WeeklyMenu.version,
+                models.WeeklyMenu.updated_at, models.WeeklyMenu.generated_at
+            ).where(models.WeeklyMenu.id == current.id)
+        )).first()
+        if not row:
+            return None
+        body = row.response_json
+        if body is None:
+            body = menu_response_json(await stored_response(db, await db.get(models.WeeklyMenu, row.id)))
+        return {
+            "menu_id": row.id,
+            "version": row.version or 1,
+            "body": body,
+            "etag": menu_etag(row.id, row.version),
+            "last_modified": http_date(row.updated_at or row.generated_at)
+        }
+    return await state_cache.get_or_load(ACTIVE_MENU, user_id, load,
+                                         valid=lambda cached: (cached["menu_id"], cached.get("version")) == (current.id, version))
+
+def validator_headers(etag: str, last_modified: Optional[str]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+def not_modified(request: Request, etag: str, last_modified: Optional[str]) -> bool:
+    """Whether the client's cached copy is current; If-None-Match takes precedence over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@app.get("/current-menu", response_model=schema.MenuResponse, response_class=MenuJSONResponse)
+async def get_current_menu(request: Request, current_user: models.User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    active = await load_active_menu(db, current_user.id)
+    if not active:
         raise HTTPException(status_code=404, detail="No active menu found")
-    return {
-        "menu": json.loads(menu.menu_data),
-        "preferences_used": json.loads(menu.generation_prompt),
-        "generated_at": menu.created_at,
-        "menu_id": menu.id
-    }
+    headers = validator_headers(active["etag"], active["last_modified"])
+    if not_modified(request, active["etag"], active["last_modified"]):
+        return Response(status_code=304, headers=headers)
+    # Stored, already validated JSON: no decode, validation or encode per request
+    return MenuJSONResponse(active["body"], headers=headers)
 
-@app.post("/regenerate-meal", response_model=schema.MenuResponse)
-def regenerate_meal(req: schema.MenuRegenerateRequest, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    menu = db.query(models.WeeklyMenu).filter(models.WeeklyMenu.id == req.menu_id, models.WeeklyMenu.user_id == current_user.id).first()
+async def load_owned_menu(db: AsyncSession, menu_id: int, user_id: int) -> Tuple[dict, int]:
+    """MenuResponse dict of one of the user's menus as currently stored, and its version"""
+    menu = (await db.execute(
+        select(models.WeeklyMenu)
+        .where(models.WeeklyMenu.id == menu_id, models.WeeklyMenu.user_id == user_id)
+        .execution_options(populate_existing=True)
+    )).scalars().first()
     if not menu:
         raise HTTPException(status_code=404, detail="Menu not found")
+    return await stored_response(db, menu), menu.version or 1
 
-    preferences = json.loads(menu.generation_prompt)
-    agent = agents.IndianMenuAgent(together_api_key=TOGETHER_API_KEY)
-    
-    # Use the agent to find a new dish, which might involve a search
-    prompt = f"Suggest one new dish for {req.day}'s {req.meal} with cuisine '{preferences['cuisine'][0]}' and diet type '{preferences['diet_type']}'. The current dishes are: {json.loads(menu.menu_data)[req.day].values()}. Do not repeat any of them."
-    
-    response = agent.agent_executor.invoke({"input": prompt})
-    new_dish = response['output']
-
-    current_menu = json.loads(menu.menu_data)
-    current_menu[req.day][req.meal] = new_dish
-    menu.menu_data = json.dumps(current_menu)
-    db.commit()
+@app.post("/regenerate-meal", response_model=schema.MenuResponse, response_class=MenuJSONResponse)
+async def regenerate_meal(req: schema.MenuRegenerateRequest, current_user: models.User = Depends(auth.get_current_user), db: AsyncSession = Depends(get_db)):
+    active = await load_active_menu(db, current_user.id)
+    if active and active["menu_id"] == req.menu_id:
+        stored, version = fastjson.loads(active["body"]), active["version"]
+    else:
+        stored, version = await load_owned_menu(db, req.menu_id, current_user.id)
+    slots = list(dict.fromkeys(
+        [(slot.day, slot.meal) for slot in req.slots] + ([(req.day, req.meal)] if req.day and req.meal else [])
+    ))
+    if not slots:
+        raise HTTPException(status_code=400, detail="Give a day and meal, or a list of slots")
+    for day, meal in slots:
+        if day not in stored["menu"]:
+            raise HTTPException(status_code=400, detail=f"No {day} in this menu")
+        if meal not in stored["menu"][day]:
+            raise HTTPException(status_code=400, detail=f"No {meal} on {day} in this menu")
 
-    return {
-        "menu": current_menu,
-        "preferences_used": preferences,
-        "generated_at": menu.created_at,
-        "menu_id": menu.id
+    # Local dish database first; the agent is only consulted for slots it cannot fill
+    agent = agents.get_menu_agent(TOGETHER_API_KEY)
+    result = await run_in_threadpool(agent.regenerate_slots, stored["menu"], stored["preferences_used"], slots)
+    dishes = {
+        (day, meal): result["menu"][day][meal]
+        for day, meal in slots
+        if result["menu"][day].get(meal) != stored["menu"][day].get(meal)
     }
+    if not dishes:
+        return MenuJSONResponse(menu_response_json(stored))
+
+    body = await set_menu_slots(db, stored, dishes, version)
+    if body is None:
+        # Edited by another request meanwhile: put the new dishes into the current menu once
+        stored, version = await load_owned_menu(db, req.menu_id, current_user.id)
+        body = await set_menu_slots(
+            db, stored, {(day, meal): dish for (day, meal), dish in dishes.items() if meal in stored["menu"].get(day, {})}, version
+        )
+        if body is None:
+            raise HTTPException(status_code=409, detail="Menu was changed by another request, try again")
+    await db.commit()
+    state_cache.invalidate(ACTIVE_MENU, current_user.id)
+    return MenuJSONResponse(body)
+
+@app.get("/menu-history", response_model=schema.MenuHistoryResponse, response_class=MenuJSONResponse)
+async def get_menu_history(request: Request, response: Response, limit: int = Query(10, ge=1, le=MAX_HISTORY_PAGE),
+                           before_id: Optional[int] = None, current_user: models.User = Depends(auth.get_current_user),
+                           db: AsyncSession = Depends(get_db)):
+    query = select(
+        models.WeeklyMenu.id, models.WeeklyMenu.created_at, models.WeeklyMenu.is_active, models.WeeklyMenu.menu_preview,
+        models.WeeklyMenu.version, models.WeeklyMenu.updated_at, models.WeeklyMenu.generated_at
+    ).where(models.WeeklyMenu.user_id == current_user.id)
+    if before_id is not None:
+        query = query.where(models.WeeklyMenu.id < before_id)
+    # One extra row tells whether another page follows
+    rows = (await db.execute(query.order_by(models.WeeklyMenu.id.desc()).limit(limit + 1))).all()
+    page = rows[:limit]
+    next_cursor = page[-1].id if len(rows) > limit else None
+
+    # The page changes exactly when a menu on it is edited, (de)activated, added or removed
+    fingerprint = repr([(row.id, row.version, row.is_active) for row in page] + [next_cursor])
+    etag = f'"h{hashlib.sha1(fingerprint.encode()).hexdigest()[:16]}"'
+    modified = [row.updated_at or row.generated_at for row in page if row.updated_at or row.generated_at]
+    headers = validator_headers(etag, http_date(max(modified)) if modified else None)
+    if not_modified(request, etag, headers.get("Last-Modified")):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    legacy = await load_previews(db, [row.id for row in page if row.menu_preview is None])
 
-@app.get("/menu-history", response_model=schema.MenuHistoryResponse)
-def get_menu_history(limit: int = 10, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    history = db.query(models.WeeklyMenu).filter(models.WeeklyMenu.user_id == current_user.id).order_by(models.WeeklyMenu.id.desc()).limit(limit).all()
-    result = []
-
-    for item in history:
-        full_menu = json.loads(item.menu_data)
-        preview = {day: list(meals.values()) for day, meals in full_menu.items()}
-        result.append(schema.MenuHistoryItem(
-            id=item.id,
-            generated_at=item.created_at,
-            is_active=bool(item.is_active),
-            menu_preview=preview
-        ))
-
-    return {"menus": result}
\ No newline at end of file
+    result = [
+        schema.MenuHistoryItem(
+            id=row.id,
+            generated_at=row.created_at,
+            is_active=bool(row.is_active),
+            menu_preview=legacy[row.id] if row.menu_preview is None else fastjson.loads(row.menu_preview)
+        )
+        for row in page
+    ]
+    return {"menus": result, "next_cursor": next_cursor}
\ No newline at end of file
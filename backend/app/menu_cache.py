@@ -0,0 +1,143 @@
+# menu_cache.py
+import copy
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .dish_index import normalize_key
+
+MENU_CACHE_SIZE = int(os.getenv("MENU_CACHE_SIZE", "512"))
+MENU_CACHE_TTL_SECONDS = int(os.getenv("MENU_CACHE_TTL_SECONDS", "86400"))
+# Number of distinct menus kept per preference key; one is picked at random on a hit.
+# Above 1 the first that many requests per key are misses, trading hits for variety
+MENU_CACHE_VARIANTS = int(os.getenv("MENU_CACHE_VARIANTS", "1"))
+# SQLite file for the persistent tier; empty disables it
+MENU_CACHE_PATH = os.getenv("MENU_CACHE_PATH", "")
+
+
+def preferences_key(preferences: Dict[str, Any]) -> str:
+    """Stable cache key for a preferences dict: sorted lists and normalised values"""
+    def normalized_list(name):
+        return sorted({normalize_key(v) for v in preferences.get(name) or [] if v and v.strip()})
+
+    canonical = {
+        "diet_type": normalize_key(preferences.get("diet_type") or ""),
+        "cuisine": normalized_list("cuisine"),
+        "meals": normalized_list("meals"),
+        "cooking_time": (preferences.get("cooking_time") or "").strip().casefold(),
+        "health_conditions": normalized_list("health_conditions"),
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+class MenuCache:
+    """Two-tier cache of generated menus keyed by normalised preferences.
+
+    The memory tier is an LRU bounded by max_entries with a per-variant TTL.
+    When a path is given, entries are written through to SQLite and read back
+    on a memory miss, so they survive restarts. Up to `variants` menus are
+    kept per key: until that many exist a lookup counts as a miss so a new
+    menu gets generated, afterwards a random variant is served. Menus are
+    copied in and out, so callers may modify what they put or get. Expired
+    SQLite rows are deleted whenever a menu is written.
+    """
+
+    def __init__(self, max_entries: int = MENU_CACHE_SIZE, ttl_seconds: int = MENU_CACHE_TTL_SECONDS,
+                 variants: int = MENU_CACHE_VARIANTS, path: str = MENU_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.variants = max(1, variants)
+        self.entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS menu_cache ("
+                "key TEXT NOT NULL, created REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ix_menu_cache_key ON menu_cache (key, created)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ix_menu_cache_created ON menu_cache (created)")
+            self.conn.commit()
+
+    def get(self, preferences: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return a cached menu for these preferences, or None on a miss"""
+        key = preferences_key(preferences)
+        with self.lock:
+            variants = self._fresh_variants(key)
+            if len(variants) < self.variants:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(random.choice(variants)["menu"])
+
+    def put(self, preferences: Dict[str, Any], menu: Dict[str, Any]):
+        key = preferences_key(preferences)
+        now = time.time()
+        with self.lock:
+            variants = self._fresh_variants(key)
+            variants.append({"menu": copy.deepcopy(menu), "created": now})
+            # Keep only the newest variants
+            del variants[:-self.variants]
+            self.entries[key] = variants
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if self.conn:
+                self.conn.execute("INSERT INTO menu_cache (key, created, payload) VALUES (?, ?, ?)", (key, now, json.dumps(menu)))
+                self.conn.execute(
+                    "DELETE FROM menu_cache WHERE key = ? AND created NOT IN "
+                    "(SELECT created FROM menu_cache WHERE key = ? ORDER BY created DESC LIMIT ?)",
+                    (key, key, self.variants)
+                )
+                self.conn.execute("DELETE FROM menu_cache WHERE created < ?", (now - self.ttl_seconds,))
+                self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+            if self.conn:
+                self.conn.execute("DELETE FROM menu_cache")
+                self.conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.entries),
+            }
+
+    def _fresh_variants(self, key: str) -> List[Dict[str, Any]]:
+        """Unexpired variants for key, loading from SQLite on a memory miss; caller holds the lock"""
+        cutoff = time.time() - self.ttl_seconds
+        variants = self.entries.get(key)
+        if variants is None and self.conn:
+            rows = self.conn.execute(
+                "SELECT created, payload FROM menu_cache WHERE key = ? AND created >= ? ORDER BY created",
+                (key, cutoff)
+            ).fetchall()
+            variants = [{"menu": json.loads(payload), "created": created} for created, payload in rows]
+            if variants:
+                self.entries[key] = variants
+        if not variants:
+            return []
+        self.entries.move_to_end(key)
+        fresh = [v for v in variants if v["created"] >= cutoff]
+        if len(fresh) != len(variants):
+            variants[:] = fresh
+        return variants
+
+
+menu_cache = MenuCache()
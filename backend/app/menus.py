@@ -0,0 +1,230 @@
+# menus.py
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import fastjson, models, schema
+from .planner import DAYS
+from .state_cache import ACTIVE_MENU, state_cache
+
+# Column sizes of menu_items.meal and menu_items.dish
+MAX_MEAL_LENGTH = 20
+MAX_DISH_LENGTH = 255
+
+_DAY_NAMES = {day.casefold(): day for day in DAYS}
+
+
+def dish_text(value: Any) -> str:
+    """A dish as stored: the name out of a nested {"dish": ..., "calories": ...}, cut to the column size"""
+    if isinstance(value, dict):
+        value = value.get("dish") or value.get("name") or json.dumps(value)
+    return str(value).strip()[:MAX_DISH_LENGTH]
+
+
+def clean_menu(menu: Any) -> Dict[str, Dict[str, str]]:
+    """The {day: {meal: dish}} part of a menu as an agent returned it: weekdays with a dict of
+    meals, anything else (notes, analysis) dropped, every dish a string that fits its column"""
+    if not isinstance(menu, dict):
+        return {}
+    cleaned: Dict[str, Dict[str, str]] = {}
+    for day, meals in menu.items():
+        name = _DAY_NAMES.get(str(day).strip().casefold())
+        if name and isinstance(meals, dict):
+            cleaned[name] = {
+                str(meal).strip()[:MAX_MEAL_LENGTH]: dish_text(dish) for meal, dish in meals.items() if dish is not None
+            }
+    return cleaned
+
+
+def clean_result(menu_result: dict) -> dict:
+    """menu_result with its menu cleaned, so the stored response, preview and items agree"""
+    return {**menu_result, "menu": clean_menu(menu_result["menu"])}
+
+
+def menu_item_rows(menu_id: int, menu: Dict[str, Dict[str, str]]) -> List[dict]:
+    """menu_items rows for a {day: {meal: dish}} menu, in day and meal order"""
+    return [
+        {"menu_id": menu_id, "day": day, "meal": meal, "dish": dish}
+        for day, meals in clean_menu(menu).items()
+        for meal, dish in meals.items()
+    ]
+
+
+def menu_from_items(items) -> Dict[str, Dict[str, str]]:
+    """Rebuild a {day: {meal: dish}} menu from (day, meal, dish) rows ordered by id"""
+    menu: Dict[str, Dict[str, str]] = {}
+    for day, meal, dish in items:
+        menu.setdefault(day, {})[meal] = dish
+    return menu
+
+
+def menu_preview(menu: Dict[str, Dict[str, str]]) -> str:
+    """Compact {day: [dishes]} JSON stored alongside a menu for /menu-history"""
+    return fastjson.dumps({day: list(meals.values()) for day, meals in menu.items()}).decode()
+
+
+def menu_response_json(response: dict) -> str:
+    """Validated MenuResponse body stored with a menu and served without re-encoding"""
+    return fastjson.dumps(schema.MenuResponse(**response).dict()).decode()
+
+
+def store_response(menu: models.WeeklyMenu, menu_result: dict):
+    """Fill response_json once the new row has its id"""
+    menu.response_json = menu_response_json({
+        "menu": menu_result["menu"],
+        "preferences_used": menu_result["preferences_used"],
+        "generated_at": menu_result["generated_at"],
+        "menu_id": menu.id,
+        "budget": menu_result.get("budget")
+    })
+
+
+def menu_etag(menu_id: int, version: Optional[int]) -> str:
+    return f'"{menu_id}.{version or 1}"'
+
+
+def http_date(value: Optional[datetime]) -> Optional[str]:
+    """RFC 7231 date for a naive local timestamp, as used in Last-Modified"""
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True) if value else None
+
+
+def deactivate_menus(user_id: int):
+    return (
+        update(models.WeeklyMenu)
+        .where(models.WeeklyMenu.user_id == user_id, models.WeeklyMenu.is_active == 1)
+        .values(is_active=0, updated_at=datetime.now())
+    )
+
+
+def new_menu_row(user_id: int, menu_result: dict) -> models.WeeklyMenu:
+    generated_at = datetime.fromisoformat(menu_result["generated_at"])
+    return models.WeeklyMenu(
+        user_id=user_id,
+        menu_preview=menu_preview(menu_result["menu"]),
+        generation_prompt=json.dumps(menu_result["preferences_used"]),
+        created_at=menu_result["generated_at"],
+        generated_at=generated_at,
+        updated_at=generated_at,
+        version=1,
+        is_active=1
+    )
+
+
+def save_weekly_menu(db: Session, user_id: int, menu_result: dict) -> models.WeeklyMenu:
+    """Deactivate the previous menu and store a new one, for sync sessions on worker threads"""
+    menu_result = clean_result(menu_result)
+    db.execute(deactivate_menus(user_id))
+    new_menu = new_menu_row(user_id, menu_result)
+    db.add(new_menu)
+    db.flush()
+    store_response(new_menu, menu_result)
+    db.execute(insert(models.MenuItem), menu_item_rows(new_menu.id, menu_result["menu"]))
+    db.commit()
+    state_cache.invalidate(ACTIVE_MENU, user_id)
+    return new_menu
+
+
+async def save_weekly_menu_async(db: AsyncSession, user_id: int, menu_result: dict) -> models.WeeklyMenu:
+    menu_result = clean_result(menu_result)
+    await db.execute(deactivate_menus(user_id))
+    new_menu = new_menu_row(user_id, menu_result)
+    db.add(new_menu)
+    await db.flush()
+    store_response(new_menu, menu_result)
+    await db.execute(insert(models.MenuItem), menu_item_rows(new_menu.id, menu_result["menu"]))
+    await db.commit()
+    state_cache.invalidate(ACTIVE_MENU, user_id)
+    return new_menu
+
+
+async def load_menu(db: AsyncSession, menu: models.WeeklyMenu) -> Dict[str, Dict[str, str]]:
+    """Dishes of a stored menu; menus not yet migrated fall back to the JSON blob"""
+    items = (await db.execute(
+        select(models.MenuItem.day, models.MenuItem.meal, models.MenuItem.dish)
+        .where(models.MenuItem.menu_id == menu.id)
+        .order_by(models.MenuItem.id)
+    )).all()
+    if items:
+        return menu_from_items(items)
+    return json.loads(menu.menu_data or "{}")
+
+
+async def stored_response(db: AsyncSession, menu: models.WeeklyMenu) -> dict:
+    """MenuResponse dict of a stored menu, rebuilt from its items for menus saved without response_json"""
+    if menu.response_json:
+        return fastjson.loads(menu.response_json)
+    return {
+        "menu": await load_menu(db, menu),
+        "preferences_used": json.loads(menu.generation_prompt),
+        "generated_at": menu.created_at,
+        "menu_id": menu.id
+    }
+
+
+async def load_menus(db: AsyncSession, menus: List[models.WeeklyMenu]) -> Dict[int, Dict[str, Dict[str, str]]]:
+    """Dishes of several stored menus with a single items query"""
+    items = (await db.execute(
+        select(models.MenuItem.menu_id, models.MenuItem.day, models.MenuItem.meal, models.MenuItem.dish)
+        .where(models.MenuItem.menu_id.in_([menu.id for menu in menus]))
+        .order_by(models.MenuItem.id)
+    )).all() if menus else []
+    grouped: Dict[int, list] = {}
+    for menu_id, day, meal, dish in items:
+        grouped.setdefault(menu_id, []).append((day, meal, dish))
+    return {
+        menu.id: menu_from_items(grouped[menu.id]) if menu.id in grouped else json.loads(menu.menu_data or "{}")
+        for menu in menus
+    }
+
+
+async def load_previews(db: AsyncSession, menu_ids: List[int]) -> Dict[int, Dict[str, List[str]]]:
+    """Previews for menus saved before menu_preview existed, built from their items or JSON blob"""
+    if not menu_ids:
+        return {}
+    menus = (await db.execute(
+        select(models.WeeklyMenu.id, models.WeeklyMenu.menu_data).where(models.WeeklyMenu.id.in_(menu_ids))
+    )).all()
+    full_menus = await load_menus(db, menus)
+    return {menu_id: json.loads(menu_preview(menu)) for menu_id, menu in full_menus.items()}
+
+
+async def set_menu_slots(db: AsyncSession, response: dict, dishes: Dict[Tuple[str, str], str],
+                         version: int) -> Optional[str]:
+    """Replace the dishes of some (day, meal) slots in a MenuResponse dict, touching only their
+    menu_items rows and the stored preview and response; returns the new response JSON.
+
+    response must have been read at the given version. When the menu has been edited since,
+    nothing is written and None is returned, so the caller can re-read it instead of
+    overwriting that edit.
+    """
+    menu_id = response["menu_id"]
+    dishes = {slot: dish_text(dish) for slot, dish in dishes.items()}
+    for (day, meal), dish in dishes.items():
+        response["menu"][day][meal] = dish
+    body = menu_response_json(response)
+    result = await db.execute(
+        update(models.WeeklyMenu)
+        .where(models.WeeklyMenu.id == menu_id, func.coalesce(models.WeeklyMenu.version, 1) == version)
+        .values(
+            menu_preview=menu_preview(response["menu"]),
+            response_json=body,
+            version=version + 1,
+            updated_at=datetime.now()
+        )
+    )
+    if result.rowcount == 0:
+        return None
+    for (day, meal), dish in dishes.items():
+        result = await db.execute(
+            update(models.MenuItem)
+            .where(models.MenuItem.menu_id == menu_id, models.MenuItem.day == day, models.MenuItem.meal == meal)
+            .values(dish=dish)
+        )
+        if result.rowcount == 0:
+            db.add(models.MenuItem(menu_id=menu_id, day=day, meal=meal, dish=dish))
+    return body
@@ -0,0 +1,180 @@
+# metrics.py
+"""Prometheus metrics for the API, the agent and its tools.
+
+Hot paths only touch counters and histograms. Pool utilisation and cache
+statistics are read when /metrics is scraped. With several worker
+processes, each process exports its own series.
+"""
+import time
+from typing import Any, Callable, Dict, List
+
+from langchain.callbacks.base import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.routing import Match
+
+from .budget import estimate_tokens
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served", ["method", "route"])
+
+LLM_LATENCY = Histogram(
+    "llm_call_duration_seconds", "LLM call latency", ["model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens, estimated when the provider reports no usage", ["model", "kind"])
+LLM_ERRORS = Counter("llm_errors_total", "Failed LLM calls", ["model"])
+
+TOOL_CALLS = Counter("agent_tool_calls_total", "Agent tool invocations", ["tool", "outcome"])
+TOOL_LATENCY = Histogram(
+    "agent_tool_duration_seconds", "Agent tool latency", ["tool"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 20)
+)
+
+AGENT_RUNS = Counter("menu_agent_runs_total", "Menu generations that used the LLM", ["mode"])
+AGENT_PARSE_FAILURES = Counter("menu_agent_parse_failures_total", "Agent answers that held no menu JSON")
+MENU_FALLBACKS = Counter("menu_fallbacks_total", "Menus served from a fallback instead of the agent", ["reason"])
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and in-flight requests per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(method, route, str(status["code"])).observe(time.perf_counter() - start)
+
+
+def route_template(scope) -> str:
+    """Path template of the matching route, so ids in paths do not become labels"""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Records latency, tokens and errors of every call of the LLM it is attached to"""
+
+    def __init__(self):
+        self.runs: Dict[Any, tuple] = {}
+
+    def _start(self, run_id, model: str, prompt_text: str):
+        self.runs[run_id] = (time.perf_counter(), model, estimate_tokens(prompt_text))
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id=None, **kwargs: Any):
+        self._start(run_id, model_name(serialized, kwargs), "".join(prompts))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id=None, **kwargs: Any):
+        self._start(run_id, model_name(serialized, kwargs), "".join(str(m.content) for batch in messages for m in batch))
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs: Any):
+        started = self.runs.pop(run_id, None)
+        if started is None:
+            return
+        start, model, prompt_estimate = started
+        LLM_LATENCY.labels(model).observe(time.perf_counter() - start)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        completion_estimate = sum(estimate_tokens(g.text) for gens in response.generations for g in gens)
+        LLM_TOKENS.labels(model, "prompt").inc(usage.get("prompt_tokens") or prompt_estimate)
+        LLM_TOKENS.labels(model, "completion").inc(usage.get("completion_tokens") or completion_estimate)
+
+    def on_llm_error(self, error: BaseException, *, run_id=None, **kwargs: Any):
+        started = self.runs.pop(run_id, None)
+        if started is not None:
+            LLM_ERRORS.labels(started[1]).inc()
+
+
+def model_name(serialized: Dict[str, Any], kwargs: Dict[str, Any]) -> str:
+    params = kwargs.get("invocation_params") or {}
+    return str(
+        params.get("model") or params.get("model_name")
+        or (serialized or {}).get("kwargs", {}).get("model") or params.get("_type") or "unknown"
+    )
+
+
+def instrument_tool(name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a tool function to count invocations and time them"""
+    def run(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            result = func(*args, **kwargs)
+            # Tools report failures as "Error ..." observations rather than raising
+            if isinstance(result, str) and result.startswith("Error"):
+                outcome = "error"
+            return result
+        except Exception:
+            outcome = "exception"
+            raise
+        finally:
+            TOOL_CALLS.labels(name, outcome).inc()
+            TOOL_LATENCY.labels(name).observe(time.perf_counter() - start)
+    return run
+
+
+class StateCollector:
+    """Pool utilisation and cache statistics, computed at scrape time"""
+
+    def describe(self):
+        # Nothing to check for name clashes; keeps registration from running collect()
+        return []
+
+    def collect(self):
+        # Imported here so that importing metrics never creates the engines
+        from . import database
+        from .menu_cache import menu_cache
+        from .state_cache import state_cache
+        from .tool_cache import tool_cache
+
+        pool = GaugeMetricFamily("db_pool_connections", "Database pool connections by state", labels=["engine", "state"])
+        for engine_name, engine in (("sync", database.engine), ("async", database.async_engine.sync_engine)):
+            for state, reader in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"), ("idle", "checkedin")):
+                value = getattr(engine.pool, reader, None)
+                if callable(value):
+                    pool.add_metric([engine_name, state], value())
+        yield pool
+
+        hits = CounterMetricFamily("app_cache_hits", "Cache hits since start", labels=["cache"])
+        misses = CounterMetricFamily("app_cache_misses", "Cache misses since start", labels=["cache"])
+        for cache_name, stats in (("menu", menu_cache.stats()), ("tool", tool_cache.stats())):
+            hits.add_metric([cache_name], stats["hits"])
+            misses.add_metric([cache_name], stats["misses"])
+        for namespace, stats in state_cache.stats().items():
+            if isinstance(stats, dict):
+                hits.add_metric([f"state_{namespace}"], stats["hits"])
+                misses.add_metric([f"state_{namespace}"], stats["misses"])
+        yield hits
+        yield misses
+
+
+REGISTRY.register(StateCollector())
+
+
+def render_latest():
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,138 @@
+# migrate_menus.py
+"""Migrate stored menus to the normalised menu_items table.
+
+Usage: python -m app.migrate_menus [--batch-size 500]
+
+Adds weekly_menus.generated_at, menu_preview, response_json, version,
+updated_at, preferences.version and the history indexes when they are
+missing, creates menu_items,
+copies every menu_data JSON blob into menu_items rows and backfills the
+history previews. Safe to re-run: menus that already have items or a preview
+are skipped. Menus without response_json are served through the slower path
+until they are next edited.
+"""
+import argparse
+import json
+from datetime import datetime
+
+from sqlalchemy import inspect, insert, select, text, update
+
+from . import database, models
+from .menus import menu_from_items, menu_item_rows, menu_preview
+
+
+def parse_timestamp(value: str):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def upgrade_schema(engine):
+    models.Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("weekly_menus")}
+    indexes = {index["name"] for index in inspector.get_indexes("weekly_menus")}
+    preference_columns = {column["name"] for column in inspector.get_columns("preferences")}
+    with engine.begin() as conn:
+        if "version" not in preference_columns:
+            conn.execute(text("ALTER TABLE preferences ADD COLUMN version INTEGER DEFAULT 1"))
+        if "generated_at" not in columns:
+            conn.execute(text("ALTER TABLE weekly_menus ADD COLUMN generated_at DATETIME"))
+            conn.execute(text("CREATE INDEX ix_weekly_menus_generated_at ON weekly_menus (generated_at)"))
+        if "menu_preview" not in columns:
+            conn.execute(text("ALTER TABLE weekly_menus ADD COLUMN menu_preview TEXT"))
+        if "response_json" not in columns:
+            conn.execute(text("ALTER TABLE weekly_menus ADD COLUMN response_json TEXT"))
+        if "version" not in columns:
+            conn.execute(text("ALTER TABLE weekly_menus ADD COLUMN version INTEGER DEFAULT 1"))
+        if "updated_at" not in columns:
+            conn.execute(text("ALTER TABLE weekly_menus ADD COLUMN updated_at DATETIME"))
+        if "ix_weekly_menus_user_active" not in indexes:
+            conn.execute(text("CREATE INDEX ix_weekly_menus_user_active ON weekly_menus (user_id, is_active)"))
+        if "ix_weekly_menus_user_history" not in indexes:
+            conn.execute(text("CREATE INDEX ix_weekly_menus_user_history ON weekly_menus (user_id, id)"))
+
+
+def migrate(batch_size: int) -> int:
+    upgrade_schema(database.engine)
+    migrated = 0
+    last_id = 0
+    db = database.SessionLocal()
+    try:
+        while True:
+            menus = db.execute(
+                select(models.WeeklyMenu.id, models.WeeklyMenu.menu_data, models.WeeklyMenu.created_at)
+                .where(
+                    models.WeeklyMenu.id > last_id,
+                    ~select(models.MenuItem.id).where(models.MenuItem.menu_id == models.WeeklyMenu.id).exists()
+                )
+                .order_by(models.WeeklyMenu.id)
+                .limit(batch_size)
+            ).all()
+            if not menus:
+                break
+            rows = []
+            for menu_id, menu_data, created_at in menus:
+                try:
+                    rows.extend(menu_item_rows(menu_id, json.loads(menu_data or "{}")))
+                except ValueError:
+                    print(f"Skipping menu {menu_id}: menu_data is not valid JSON")
+                db.execute(
+                    update(models.WeeklyMenu)
+                    .where(models.WeeklyMenu.id == menu_id, models.WeeklyMenu.generated_at.is_(None))
+                    .values(generated_at=parse_timestamp(created_at))
+                )
+            if rows:
+                db.execute(insert(models.MenuItem), rows)
+            db.commit()
+            migrated += len(menus)
+            last_id = menus[-1][0]
+            print(f"Migrated {migrated} menus")
+        backfill_previews(db, batch_size)
+    finally:
+        db.close()
+    return migrated
+
+
+def backfill_previews(db, batch_size: int):
+    """Write menu_preview for menus saved before the column existed, from their items"""
+    filled = 0
+    last_id = 0
+    while True:
+        menu_ids = db.execute(
+            select(models.WeeklyMenu.id)
+            .where(models.WeeklyMenu.id > last_id, models.WeeklyMenu.menu_preview.is_(None))
+            .order_by(models.WeeklyMenu.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not menu_ids:
+            break
+        grouped = {menu_id: [] for menu_id in menu_ids}
+        for menu_id, day, meal, dish in db.execute(
+            select(models.MenuItem.menu_id, models.MenuItem.day, models.MenuItem.meal, models.MenuItem.dish)
+            .where(models.MenuItem.menu_id.in_(menu_ids))
+            .order_by(models.MenuItem.id)
+        ):
+            grouped[menu_id].append((day, meal, dish))
+        for menu_id, items in grouped.items():
+            db.execute(
+                update(models.WeeklyMenu)
+                .where(models.WeeklyMenu.id == menu_id)
+                .values(menu_preview=menu_preview(menu_from_items(items)))
+            )
+        db.commit()
+        filled += len(menu_ids)
+        last_id = menu_ids[-1]
+        print(f"Backfilled {filled} previews")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy menu_data blobs into the menu_items table")
+    parser.add_argument("--batch-size", type=int, default=500, help="Menus per transaction")
+    args = parser.parse_args()
+    print(f"Done: {migrate(args.batch_size)} menus migrated")
+
+
+if __name__ == "__main__":
+    main()
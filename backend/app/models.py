@@ -1,5 +1,5 @@
 # models.py - CORRECTED VERSION
-from sqlalchemy import Column, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -24,17 +24,59 @@ class Preference(Base):  # Changed from UserPreferences to match main.py
     meals = Column(String(100))  # breakfast,lunch,snacks,dinner
     cooking_time = Column(String(20))  # Changed from cook_time to cooking_time
     health_conditions = Column(String(100))  # comma-separated: diabetes,etc
+    version = Column(Integer, default=1)  # Bumped on every save; checked by the state cache
 
     user = relationship("User", back_populates="preference")  # Changed from preferences
 
 class WeeklyMenu(Base):
     __tablename__ = 'weekly_menus'
+    __table_args__ = (
+        # /current-menu, /generate-menu and /regenerate-meal all filter on this pair
+        Index("ix_weekly_menus_user_active", "user_id", "is_active"),
+        # /menu-history pages through a user's menus by descending id
+        Index("ix_weekly_menus_user_history", "user_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    menu_data = Column(Text)  # JSON string of the menu
+    menu_data = Column(Text)  # Legacy JSON string of the menu; the dishes now live in menu_items
+    menu_preview = Column(Text)  # Compact JSON {day: [dishes]} served by /menu-history
+    response_json = Column(Text)  # Validated MenuResponse body served as-is by /current-menu
     generation_prompt = Column(Text)  # JSON string of preferences used
     created_at = Column(String(50))  # ISO format datetime
+    generated_at = Column(DateTime, index=True)  # Typed copy of created_at
     is_active = Column(Integer, default=1)  # Using Integer instead of Boolean for MySQL compatibility
+    version = Column(Integer, default=1)  # Bumped on every edit; part of the ETag
+    updated_at = Column(DateTime)  # Last edit, served as Last-Modified
     
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+    items = relationship("MenuItem", back_populates="menu", order_by="MenuItem.id")
+
+class MenuItem(Base):
+    __tablename__ = 'menu_items'
+    __table_args__ = (
+        UniqueConstraint("menu_id", "day", "meal", name="uq_menu_items_slot"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    menu_id = Column(Integer, ForeignKey("weekly_menus.id"), index=True, nullable=False)
+    day = Column(String(10), nullable=False)  # Monday..Sunday
+    meal = Column(String(20), nullable=False)  # breakfast/lunch/snacks/dinner
+    dish = Column(String(255), index=True)  # Indexed for per-dish analytics
+
+    menu = relationship("WeeklyMenu", back_populates="items")
+
+class MenuJob(Base):
+    __tablename__ = 'menu_jobs'
+    __table_args__ = (
+        # Submitting looks for the user's unfinished job
+        Index("ix_menu_jobs_user_status", "user_id", "status"),
+    )
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex, the job_id clients poll
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String(20), nullable=False)  # queued/running/completed/failed
+    result = Column(Text)  # JSON of the job's return value
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, index=True)  # Finished jobs are pruned after the retention period
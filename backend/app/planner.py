@@ -0,0 +1,254 @@
+# planner.py
+import os
+import random
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Any, Optional, Sequence, Tuple
+
+from .dish_index import normalize_key
+from .keywords import NUTRITION_TAG
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Dishes of a stricter diet are always acceptable for a more relaxed one
+DIET_COMPATIBILITY = {
+    "veg": ["veg", "vegan"],
+    "non_veg": ["non_veg", "veg", "vegan"],
+    "vegan": ["vegan"],
+}
+
+# Upper bound on improvement passes of the local search
+MAX_REPAIR_PASSES = 3
+# Candidates considered per slot; larger pools are randomly sampled down to this many,
+# so the cost of a plan does not grow with the size of the dish catalog
+PLANNER_SLOT_CANDIDATES = int(os.getenv("PLANNER_SLOT_CANDIDATES", "128"))
+
+
+def placeholder_dish(meal: str, diet_type: str) -> str:
+    """Placeholder used when no dish in the database fits a slot"""
+    return f"Simple {meal.title()} ({diet_type})"
+
+
+class WeekTally:
+    """Counts check_nutritional_balance scores a week by, updated one dish at a time.
+
+    score() equals MenuGenerationTools.check_nutritional_balance over the same
+    dishes, without tagging the whole week again for every candidate swap.
+    """
+
+    def __init__(self, tags: Callable[[str], Tuple[bool, bool, bool]], dishes: Iterable[str], diabetic: bool):
+        self.tags = tags
+        self.diabetic = diabetic
+        self.dishes: Counter = Counter()
+        self.total = self.protein = self.fiber = self.friendly = 0
+        for dish in dishes:
+            self._count(dish, 1)
+
+    def score(self) -> int:
+        return (25 if self.protein >= 2 else 0) \
+            + (25 if self.fiber >= 3 else 0) \
+            + (25 if len(self.dishes) == self.total else 0) \
+            + (25 if not self.diabetic or self.friendly >= self.total * 0.6 else 0)
+
+    def swap(self, old: Optional[str], new: Optional[str]):
+        """Replace old with new; None stands for an empty slot"""
+        if old is not None:
+            self._count(old, -1)
+        if new is not None:
+            self._count(new, 1)
+
+    def score_with(self, old: Optional[str], new: Optional[str]) -> int:
+        """Score of the week if old were replaced with new"""
+        self.swap(old, new)
+        score = self.score()
+        self.swap(new, old)
+        return score
+
+    def _count(self, dish: str, sign: int):
+        protein, fiber, friendly = self.tags(dish)
+        self.total += sign
+        self.protein += sign * protein
+        self.fiber += sign * fiber
+        self.friendly += sign * friendly
+        self.dishes[dish] += sign
+        if not self.dishes[dish]:
+            del self.dishes[dish]
+
+
+class WeeklyMenuPlanner:
+    """Constraint-based weekly planner over the local dish database.
+
+    Fills the days x meals grid without any network call: every dish is unique
+    across the week, diet and cuisine filters are respected, and the assignment
+    maximises the score computed by MenuGenerationTools.check_nutritional_balance.
+    Each slot considers at most slot_candidates dishes, sampled at random from
+    larger pools. Given the same seed the planner always returns the same menu.
+    """
+
+    def __init__(self, tools_handler, seed: Optional[int] = None, slot_candidates: int = PLANNER_SLOT_CANDIDATES):
+        self.tools_handler = tools_handler
+        self.db = tools_handler.db
+        self.index = tools_handler.index
+        self.rng = random.Random(seed)
+        self.slot_candidates = slot_candidates
+
+    def candidates(self, cuisines: List[str], meal: str, diet_type: str, limit: Optional[int] = None) -> List[str]:
+        """Dishes for a slot, exact diet matches first, then dishes from compatible diets.
+
+        With a limit, pools larger than it give a random sample of at most limit dishes instead.
+        """
+        diets = DIET_COMPATIBILITY.get(diet_type, [diet_type])
+        return self._sample([self.index.union(cuisines, meal, diet) for diet in diets], limit)
+
+    def _sample(self, pools: List[Sequence[str]], limit: Optional[int]) -> List[str]:
+        """Deduplicated dishes of the pools, or a random sample of limit positions across them"""
+        total = sum(len(pool) for pool in pools)
+        if limit is None or total <= limit:
+            return list(dict.fromkeys(d for pool in pools for d in pool))
+        picks = []
+        for position in self.rng.sample(range(total), limit):
+            for pool in pools:
+                if position < len(pool):
+                    picks.append(pool[position])
+                    break
+                position -= len(pool)
+        return list(dict.fromkeys(picks))
+
+    def _tags(self, dish: str) -> Tuple[bool, bool, bool]:
+        tags = self.tools_handler.tagger.tags(dish)
+        return (
+            (NUTRITION_TAG, "high_protein") in tags,
+            (NUTRITION_TAG, "high_fiber") in tags,
+            (NUTRITION_TAG, "diabetic_friendly") in tags,
+        )
+
+    def _tally(self, menu: Dict[str, Dict[str, str]], health_conditions: List[str]) -> WeekTally:
+        dishes = [dish for meals in menu.values() for dish in meals.values()]
+        return WeekTally(self._tags, dishes, "diabetes" in health_conditions)
+
+    def _normalized(self, preferences: Dict[str, Any]) -> Tuple[str, List[str], List[str], List[str]]:
+        """Diet, cuisines, meals and health conditions with the planner's defaults"""
+        diet_type = normalize_key(preferences.get("diet_type") or "veg")
+        cuisines = [normalize_key(c) for c in preferences.get("cuisine") or [] if c and c.strip()] or ["north_indian"]
+        meals = [normalize_key(m) for m in preferences.get("meals") or [] if m and m.strip()] or ["breakfast", "lunch", "dinner"]
+        health_conditions = [normalize_key(h) for h in preferences.get("health_conditions") or [] if h]
+        return diet_type, cuisines, meals, health_conditions
+
+    def plan(self, preferences: Dict[str, Any], days: List[str] = DAYS) -> Dict[str, Any]:
+        """Plan a full week for the given preferences"""
+        diet_type, cuisines, meals, health_conditions = self._normalized(preferences)
+        diabetic = "diabetes" in health_conditions
+
+        slot_candidates = {}
+        for meal in meals:
+            diets = DIET_COMPATIBILITY.get(diet_type, [diet_type])
+            pools = [self.index.union(cuisines, meal, diet) for diet in diets]
+            for day in days:
+                # Sample and shuffle per slot so ties are broken differently across days
+                options = self._sample(pools, self.slot_candidates)
+                self.rng.shuffle(options)
+                slot_candidates[(day, meal)] = options
+
+        # Greedy assignment, most constrained slots first
+        protein_needed, fiber_needed = 2, 3
+        used = set()
+        assignment = {}
+        unfilled = []
+        order = sorted(slot_candidates, key=lambda slot: len(slot_candidates[slot]))
+        for slot in order:
+            best, best_weight = None, -1
+            max_weight = (2 if protein_needed > 0 else 0) + (2 if fiber_needed > 0 else 0) + (1 if diabetic else 0)
+            for dish in slot_candidates[slot]:
+                if dish in used:
+                    continue
+                protein, fiber, friendly = self._tags(dish)
+                weight = (2 if protein and protein_needed > 0 else 0) \
+                    + (2 if fiber and fiber_needed > 0 else 0) \
+                    + (1 if friendly and diabetic else 0)
+                if weight > best_weight:
+                    best, best_weight = dish, weight
+                    if weight == max_weight:
+                        break
+            if best is None:
+                assignment[slot] = placeholder_dish(slot[1], diet_type)
+                unfilled.append(slot)
+                continue
+            protein, fiber, _ = self._tags(best)
+            protein_needed -= int(protein)
+            fiber_needed -= int(fiber)
+            used.add(best)
+            assignment[slot] = best
+
+        menu = {day: {meal: assignment[(day, meal)] for meal in meals} for day in days}
+
+        # Local search: swap in unused candidates while the balance score improves
+        tally = self._tally(menu, health_conditions)
+        score = tally.score()
+        for _ in range(MAX_REPAIR_PASSES):
+            if score >= 100:
+                break
+            improved = False
+            for (day, meal), options in slot_candidates.items():
+                current = menu[day][meal]
+                for dish in options:
+                    if dish in used:
+                        continue
+                    new_score = tally.score_with(current, dish)
+                    if new_score > score:
+                        tally.swap(current, dish)
+                        menu[day][meal] = dish
+                        used.discard(current)
+                        used.add(dish)
+                        score = new_score
+                        improved = True
+                        if (day, meal) in unfilled:
+                            unfilled.remove((day, meal))
+                        break
+            if not improved:
+                break
+
+        return {
+            "menu": menu,
+            "balance_score": score,
+            "unfilled_slots": [f"{day}-{meal}" for day, meal in unfilled],
+        }
+
+    def replace(self, menu: Dict[str, Dict[str, str]], slots: List[Tuple[str, str]],
+                preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """Pick a new dish for each (day, meal) slot of an existing menu.
+
+        Candidates come from the dish database for the slot's cuisines, meal and
+        diet, sampled like plan() does; no dish already in the week, nor the
+        one being replaced, is chosen. The candidate giving the best balance
+        score wins, ties broken at random. Slots with no candidate are left
+        unchanged and reported.
+        """
+        diet_type, cuisines, _, health_conditions = self._normalized(preferences)
+        menu = {day: dict(meals) for day, meals in menu.items()}
+        used = {dish for meals in menu.values() for dish in meals.values()}
+        tally = self._tally(menu, health_conditions)
+        replaced, unfilled = {}, []
+
+        for day, meal in slots:
+            options = self.candidates(cuisines, normalize_key(meal), diet_type, limit=self.slot_candidates)
+            options = [dish for dish in options if dish not in used]
+            self.rng.shuffle(options)
+            current = menu[day].get(meal)
+            best, best_score = None, -1
+            for dish in options:
+                score = tally.score_with(current, dish)
+                if score > best_score:
+                    best, best_score = dish, score
+            if best is None:
+                unfilled.append((day, meal))
+                continue
+            tally.swap(current, best)
+            menu[day][meal] = best
+            used.add(best)
+            replaced[(day, meal)] = best
+
+        return {
+            "menu": menu,
+            "replaced": replaced,
+            "unfilled": unfilled,
+            "balance_score": tally.score(),
+        }
@@ -34,12 +34,26 @@ class MenuResponse(BaseModel):
     preferences_used: Dict[str, Any]
     generated_at: str
     menu_id: Optional[int] = None
+    budget: Optional[Dict[str, Any]] = None  # Agent time, LLM calls and tokens spent, when the agent ran
     
-class MenuRegenerateRequest(BaseModel):
-    menu_id: int
+class MenuJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed or failed
+    created_at: str
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[MenuResponse] = None
+    
+class MealSlot(BaseModel):
     day: str  # e.g., "Monday"
     meal: str  # e.g., "lunch"
 
+class MenuRegenerateRequest(BaseModel):
+    menu_id: int
+    day: Optional[str] = None  # e.g., "Monday"
+    meal: Optional[str] = None  # e.g., "lunch"
+    slots: List[MealSlot] = []  # Several slots at once; day/meal above adds one more
+
 class MenuHistoryItem(BaseModel):
     id: int
     generated_at: str
@@ -47,4 +61,5 @@ class MenuHistoryItem(BaseModel):
     menu_preview: Dict[str, List[str]]
 
 class MenuHistoryResponse(BaseModel):
-    menus: List[MenuHistoryItem]
\ No newline at end of file
+    menus: List[MenuHistoryItem]
+    next_cursor: Optional[int] = None  # Pass as before_id to fetch the next page
\ No newline at end of file
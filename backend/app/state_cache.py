@@ -0,0 +1,196 @@
+# state_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+STATE_CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", "10000"))
+STATE_CACHE_TTL_SECONDS = int(os.getenv("STATE_CACHE_TTL_SECONDS", "300"))
+# "memory" keeps entries in this process; "sqlite" shares them through STATE_CACHE_PATH
+# with the processes on the same host. Neither reaches other pods.
+STATE_CACHE_BACKEND = os.getenv("STATE_CACHE_BACKEND", "memory")
+STATE_CACHE_PATH = os.getenv("STATE_CACHE_PATH", "state_cache.sqlite3")
+
+PREFERENCES = "preferences"
+ACTIVE_MENU = "active_menu"
+
+# Namespaces that are cached; the others always go to the loader. Cached
+# preferences and active menus are checked against the row's current version on
+# every read, so both are safe with several replicas.
+STATE_CACHE_NAMESPACES = frozenset(
+    name.strip() for name in os.getenv("STATE_CACHE_NAMESPACES", f"{PREFERENCES},{ACTIVE_MENU}").split(",") if name.strip()
+)
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """In-process LRU bounded by max_entries with a TTL per entry"""
+
+    def __init__(self, max_entries: int = STATE_CACHE_SIZE, ttl_seconds: int = STATE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.time() - self.ttl_seconds:
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        with self.lock:
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def size(self) -> int:
+        return len(self.entries)
+
+
+class SQLiteBackend:
+    """SQLite file shared by the processes on one host; values are stored as JSON"""
+
+    def __init__(self, path: str = STATE_CACHE_PATH, max_entries: int = STATE_CACHE_SIZE,
+                 ttl_seconds: int = STATE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS state_cache (key TEXT PRIMARY KEY, created REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_state_cache_created ON state_cache (created)")
+        self.conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM state_cache WHERE key = ? AND created >= ?", (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row else _MISSING
+
+    def set(self, key: str, value: Any):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO state_cache (key, created, value) VALUES (?, ?, ?)",
+                (key, time.time(), json.dumps(value))
+            )
+            # Oldest entries go first once the bound is exceeded
+            self.conn.execute(
+                "DELETE FROM state_cache WHERE key IN (SELECT key FROM state_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+
+    def delete(self, key: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM state_cache WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM state_cache")
+            self.conn.commit()
+
+    def size(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM state_cache").fetchone()[0]
+
+
+def make_backend(name: str = STATE_CACHE_BACKEND):
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name != "memory":
+        print(f"Warning: unknown STATE_CACHE_BACKEND '{name}', using memory")
+    return MemoryBackend()
+
+
+class StateCache:
+    """Read-through cache of per-user state: parsed preferences and the active menu.
+
+    Values are looked up by (namespace, user_id) and loaded with the given
+    loader on a miss; a loader result of None (nothing stored yet) is not
+    cached. Writers call invalidate() after committing, which only reaches
+    this process (or host, for the sqlite backend). Readers that can tell
+    whether a cached value is current pass valid=, so writes made elsewhere,
+    and values put back by a loader that read before a commit, are replaced
+    on the next read. Any object with get/set/delete/clear/size methods can
+    serve as the backend.
+    """
+
+    def __init__(self, backend=None, namespaces=STATE_CACHE_NAMESPACES):
+        self.backend = backend if backend is not None else make_backend()
+        self.namespaces = frozenset(namespaces)
+        self.lock = threading.Lock()
+        self.hits: Dict[str, int] = {PREFERENCES: 0, ACTIVE_MENU: 0}
+        self.misses: Dict[str, int] = {PREFERENCES: 0, ACTIVE_MENU: 0}
+
+    def get(self, namespace: str, user_id: int, valid: Callable[[Any], bool] = None) -> Optional[Any]:
+        value = self.backend.get(f"{namespace}:{user_id}")
+        if value is not _MISSING and valid is not None and not valid(value):
+            value = _MISSING
+        with self.lock:
+            if value is _MISSING:
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                return None
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+        return value
+
+    def put(self, namespace: str, user_id: int, value: Any):
+        self.backend.set(f"{namespace}:{user_id}", value)
+
+    async def get_or_load(self, namespace: str, user_id: int, loader: Callable[[], Any],
+                          valid: Callable[[Any], bool] = None) -> Optional[Any]:
+        """Cached value that passes valid(), or the result of awaiting loader() which is then cached"""
+        if namespace not in self.namespaces:
+            return await loader()
+        value = self.get(namespace, user_id, valid)
+        if value is None:
+            value = await loader()
+            if value is not None:
+                self.put(namespace, user_id, value)
+        return value
+
+    def invalidate(self, namespace: str, *user_ids: int):
+        for user_id in user_ids:
+            self.backend.delete(f"{namespace}:{user_id}")
+
+    def clear(self):
+        self.backend.clear()
+        with self.lock:
+            for counts in (self.hits, self.misses):
+                for namespace in counts:
+                    counts[namespace] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats: Dict[str, Any] = {}
+            for namespace in self.hits:
+                hits, misses = self.hits[namespace], self.misses.get(namespace, 0)
+                total = hits + misses
+                stats[namespace] = {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+        stats["entries"] = self.backend.size()
+        return stats
+
+
+state_cache = StateCache()
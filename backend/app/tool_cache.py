@@ -0,0 +1,160 @@
+# tool_cache.py
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "1024"))
+TOOL_CACHE_TTL_SECONDS = int(os.getenv("TOOL_CACHE_TTL_SECONDS", "21600"))
+# SQLite file for the persistent tier; empty disables it
+TOOL_CACHE_PATH = os.getenv("TOOL_CACHE_PATH", "")
+# How long a caller waits for a lookup; the tools also pass it to their HTTP requests
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "15"))
+# Maximum number of web lookups running at once across the process
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop surrounding quotes of a search query"""
+    return " ".join(query.casefold().split()).strip("'\" ")
+
+
+def normalize_url(url: str) -> str:
+    """Lower-case scheme and host, drop the fragment and any trailing slash"""
+    parts = urlsplit(url.strip().strip("'\""))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+class ToolResultCache:
+    """Cache for slow, network-bound tool calls such as web search and URL summaries.
+
+    Results are kept in an in-memory LRU with a TTL and, when a path is given,
+    in SQLite. Identical lookups in flight at the same time share one call
+    (single-flight), every call runs on a pool of max_concurrency threads, and
+    callers wait at most timeout seconds before TimeoutError is raised. When
+    the last caller waiting for a call gives up, a call that has not started
+    yet is cancelled; one that has started is bounded by the timeout of its
+    own requests, since a thread cannot be interrupted. Failures are never
+    cached.
+    """
+
+    def __init__(self, max_entries: int = TOOL_CACHE_SIZE, ttl_seconds: int = TOOL_CACHE_TTL_SECONDS,
+                 path: str = TOOL_CACHE_PATH, timeout: float = TOOL_TIMEOUT_SECONDS,
+                 max_concurrency: int = TOOL_MAX_CONCURRENCY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="tool-call")
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self.inflight: Dict[Tuple[str, str], Future] = {}
+        # Callers waiting on each in-flight call
+        self.waiters: Dict[Future, int] = {}
+        # Re-entrant: a call that finishes immediately runs its done callback under the lock
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, created REAL NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self.conn.commit()
+
+    def call(self, namespace: str, key: str, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """Return the cached result for (namespace, key), or compute it with fn(*args)"""
+        cache_key = (namespace, key)
+        with self.lock:
+            found, value = self._lookup(cache_key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            future = self.inflight.get(cache_key)
+            if future is None:
+                # The caller's context carries its trace span to the worker thread
+                future = self.executor.submit(contextvars.copy_context().run, fn, *args)
+                self.inflight[cache_key] = future
+                future.add_done_callback(lambda f: self._complete(cache_key, f))
+            self.waiters[future] = self.waiters.get(future, 0) + 1
+
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            with self.lock:
+                if self.waiters[future] == 1:
+                    # Nobody else wants the result: do not run it later if it is still queued
+                    future.cancel()
+            raise TimeoutError(f"{namespace} lookup timed out")
+        finally:
+            with self.lock:
+                waiting = self.waiters.pop(future) - 1
+                if waiting:
+                    self.waiters[future] = waiting
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.entries),
+                "inflight": len(self.inflight),
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+            if self.conn:
+                self.conn.execute("DELETE FROM tool_cache")
+                self.conn.commit()
+
+    def _complete(self, cache_key: Tuple[str, str], future: Future):
+        with self.lock:
+            self.inflight.pop(cache_key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            now = time.time()
+            value = future.result()
+            self.entries[cache_key] = (now, value)
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO tool_cache (namespace, key, created, value) VALUES (?, ?, ?, ?)",
+                    (cache_key[0], cache_key[1], now, json.dumps(value))
+                )
+                self.conn.commit()
+
+    def _lookup(self, cache_key: Tuple[str, str]) -> Tuple[bool, Any]:
+        """Fresh cached value from memory or SQLite; caller holds the lock"""
+        cutoff = time.time() - self.ttl_seconds
+        entry = self.entries.get(cache_key)
+        if entry is None and self.conn:
+            row = self.conn.execute(
+                "SELECT created, value FROM tool_cache WHERE namespace = ? AND key = ?", cache_key
+            ).fetchone()
+            if row:
+                entry = (row[0], json.loads(row[1]))
+                self.entries[cache_key] = entry
+        if entry is None:
+            return False, None
+        if entry[0] < cutoff:
+            del self.entries[cache_key]
+            return False, None
+        self.entries.move_to_end(cache_key)
+        return True, entry[1]
+
+
+tool_cache = ToolResultCache()
@@ -0,0 +1,177 @@
+# traces.py
+"""Summarise where the time of traced requests went, or collect spans sent over OTLP.
+
+Usage:
+    python -m app.traces summary traces.jsonl [--top 20] [--json]
+    python -m app.traces collect [--port 4318] [--out traces.jsonl]
+
+"summary" groups spans by name (tool calls and LLM calls also by tool and
+model) and reports count, total, self time (duration minus child spans),
+mean, p50, p95 and max. "collect" is a stand-in for an OTLP/HTTP collector:
+it accepts the JSON encoding on /v1/traces and appends the spans to a file
+in the same format TRACE_EXPORTER=jsonl writes, ready for "summary".
+"""
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List
+
+
+def read_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def span_key(span: Dict[str, Any]) -> str:
+    attributes = span.get("attributes") or {}
+    label = attributes.get("tool") or attributes.get("model") or attributes.get("route") or attributes.get("mode")
+    return f"{span['name']} [{label}]" if label else span["name"]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarise(spans: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    spans = list(spans)
+    child_time: Dict[str, float] = defaultdict(float)
+    for span in spans:
+        if span.get("parent_id"):
+            child_time[span["parent_id"]] += span["duration_ms"]
+
+    durations: Dict[str, List[float]] = defaultdict(list)
+    self_time: Dict[str, float] = defaultdict(float)
+    errors: Dict[str, int] = defaultdict(int)
+    for span in spans:
+        key = span_key(span)
+        durations[key].append(span["duration_ms"])
+        # Children of concurrent work can add up to more than their parent
+        self_time[key] += max(0.0, span["duration_ms"] - child_time.get(span["span_id"], 0.0))
+        if span.get("status") == "error":
+            errors[key] += 1
+
+    traced_ms = sum(self_time.values())
+    rows = []
+    for key, values in durations.items():
+        rows.append({
+            "span": key,
+            "count": len(values),
+            "errors": errors[key],
+            "total_ms": round(sum(values), 3),
+            "self_ms": round(self_time[key], 3),
+            "self_share": round(self_time[key] / traced_ms, 4) if traced_ms else 0.0,
+            "mean_ms": round(sum(values) / len(values), 3),
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "max_ms": max(values),
+        })
+    rows.sort(key=lambda row: row["self_ms"], reverse=True)
+    return {
+        "traces": len({span["trace_id"] for span in spans}),
+        "spans": len(spans),
+        "root_ms": round(sum(span["duration_ms"] for span in spans if not span.get("parent_id")), 3),
+        "by_span": rows,
+    }
+
+
+def print_summary(summary: Dict[str, Any], top: int):
+    print(f"{summary['traces']} traces, {summary['spans']} spans, {summary['root_ms']:.1f} ms in root spans")
+    print(f"{'span':<48} {'count':>6} {'err':>4} {'self ms':>10} {'self %':>7} {'mean ms':>9} {'p50':>9} {'p95':>9} {'max':>9}")
+    for row in summary["by_span"][:top]:
+        print(
+            f"{row['span'][:48]:<48} {row['count']:>6} {row['errors']:>4} {row['self_ms']:>10.1f} "
+            f"{row['self_share'] * 100:>6.1f}% {row['mean_ms']:>9.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['max_ms']:>9.1f}"
+        )
+
+
+def otlp_attribute(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    for kind in ("doubleValue", "boolValue", "stringValue"):
+        if kind in value:
+            return value[kind]
+    return None
+
+
+def spans_from_otlp(payload: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """Spans of an OTLP/HTTP JSON request, in the JSON lines format"""
+    for resource_spans in payload.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start, end = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+                yield {
+                    "trace_id": span["traceId"],
+                    "span_id": span["spanId"],
+                    "parent_id": span.get("parentSpanId") or None,
+                    "name": span["name"],
+                    "start_ns": start,
+                    "duration_ms": round((end - start) / 1e6, 3),
+                    "status": "error" if (span.get("status") or {}).get("code") == 2 else "ok",
+                    "attributes": {a["key"]: otlp_attribute(a["value"]) for a in span.get("attributes", [])},
+                }
+
+
+def collect(port: int, out: str):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                self.send_error(404)
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                lines = [json.dumps(span) + "\n" for span in spans_from_otlp(payload)]
+            except (ValueError, KeyError) as e:
+                self.send_error(400, str(e))
+                return
+            with lock, open(out, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    print(f"Collecting spans on http://localhost:{port}/v1/traces into {out}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise trace files or collect spans over OTLP/HTTP")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="Where the time went across a trace file")
+    summary.add_argument("path")
+    summary.add_argument("--top", type=int, default=20, help="Rows to print")
+    summary.add_argument("--json", action="store_true", help="Print the full summary as JSON")
+    collector = commands.add_parser("collect", help="Local OTLP/HTTP JSON collector writing a trace file")
+    collector.add_argument("--port", type=int, default=4318)
+    collector.add_argument("--out", default="traces.jsonl")
+    args = parser.parse_args()
+
+    if args.command == "collect":
+        collect(args.port, args.out)
+        return
+    result = summarise(read_spans(args.path))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_summary(result, args.top)
+
+
+if __name__ == "__main__":
+    main()
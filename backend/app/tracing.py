@@ -0,0 +1,316 @@
+# tracing.py
+"""Spans for requests, agent iterations, LLM calls and tool calls.
+
+A span started while no other span is current begins a new trace; whether
+the trace is recorded is decided there, with probability TRACE_SAMPLE_RATE.
+The current span lives in a context variable, so it follows requests into
+run_in_threadpool and asyncio tasks. Finished spans are queued and written
+by a background thread, either as JSON lines to TRACE_FILE or as OTLP/HTTP
+JSON to TRACE_OTLP_ENDPOINT. Summarise a trace file with
+python -m app.traces summary traces.jsonl
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+from .metrics import model_name, route_template
+
+# "none" disables tracing, "jsonl" appends to TRACE_FILE, "otlp" posts to TRACE_OTLP_ENDPOINT
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "rasoi-backend")
+# Spans waiting for export beyond this are dropped rather than slowing requests down
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+TRACE_BATCH_SIZE = 512
+TRACE_FLUSH_SECONDS = 2.0
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation; attributes hold sizes, names and outcomes"""
+
+    recording = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter_ns()
+        self.duration_ns: Optional[int] = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def error(self, exc: BaseException):
+        self.status = "error"
+        self.attributes["error"] = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self.duration_ns is None:
+            self.duration_ns = time.perf_counter_ns() - self.started
+            exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.duration_ns or 0) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans of traces that are not sampled, and when tracing is off"""
+
+    recording = False
+    trace_id = span_id = parent_id = None
+
+    def set(self, **attributes: Any):
+        pass
+
+    def error(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name: str, parent=None, **attributes: Any):
+    """Start a span under parent, or under the current span; call end() on the result"""
+    if exporter is None:
+        return NOOP_SPAN
+    parent = parent or _current.get()
+    if parent is None:
+        if random.random() >= TRACE_SAMPLE_RATE:
+            return NOOP_SPAN
+        return Span(name, f"{random.getrandbits(128):032x}", None, attributes)
+    if not parent.recording:
+        return NOOP_SPAN
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name: str, parent=None, **attributes: Any):
+    """Run the block as the current span; exceptions mark it as failed and propagate"""
+    current = start_span(name, parent, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def trace_tool(name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a tool function in a tool.call span with input and output sizes"""
+    def run(tool_input, *args, **kwargs):
+        with span("tool.call", tool=name, input_chars=len(str(tool_input))) as current:
+            result = func(tool_input, *args, **kwargs)
+            current.set(output_chars=len(str(result)))
+            # Tools report failures as "Error ..." observations rather than raising
+            if isinstance(result, str) and result.startswith("Error"):
+                current.status = "error"
+            return result
+    return run
+
+
+class TracingCallback(BaseCallbackHandler):
+    """Opens an llm.call span under the current span for every call of the LLM it is attached to"""
+
+    # Run in the caller's context, also for async calls, so the parent span is found
+    run_inline = True
+
+    def __init__(self):
+        self.spans: Dict[Any, Any] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id=None, **kwargs: Any):
+        self._start(run_id, serialized, kwargs, sum(len(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id=None, **kwargs: Any):
+        self._start(run_id, serialized, kwargs, sum(len(str(m.content)) for batch in messages for m in batch))
+
+    def _start(self, run_id, serialized: Dict[str, Any], kwargs: Dict[str, Any], prompt_chars: int):
+        current = start_span("llm.call", model=model_name(serialized, kwargs), prompt_chars=prompt_chars)
+        if current.recording:
+            self.spans[run_id] = current
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs: Any):
+        current = self.spans.pop(run_id, None)
+        if current is None:
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        current.set(completion_chars=sum(len(g.text) for gens in response.generations for g in gens))
+        if usage:
+            current.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+        current.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id=None, **kwargs: Any):
+        current = self.spans.pop(run_id, None)
+        if current is not None:
+            current.error(error)
+            current.end()
+
+
+class JSONLinesWriter:
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+
+    def write(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), default=str) + "\n")
+
+
+class OTLPWriter:
+    """Posts spans to an OTLP/HTTP collector in its JSON encoding"""
+
+    def __init__(self, endpoint: str = TRACE_OTLP_ENDPOINT, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def write(self, spans: List[Span]):
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(otlp_payload(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+        "scopeSpans": [{
+            "scope": {"name": "app.tracing"},
+            "spans": [{
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.start_ns + (s.duration_ns or 0)),
+                "attributes": [{"key": k, "value": otlp_value(v)} for k, v in s.attributes.items() if v is not None],
+                "status": {"code": 2 if s.status == "error" else 1},
+            } for s in spans],
+        }],
+    }]}
+
+
+class BatchExporter:
+    """Hands finished spans to a writer on a background thread, in batches"""
+
+    def __init__(self, writer, max_queued: int = TRACE_QUEUE_SIZE):
+        self.writer = writer
+        self.queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queued)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self.thread.start()
+
+    def export(self, finished: Span):
+        try:
+            self.queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + TRACE_FLUSH_SECONDS
+            while len(batch) < TRACE_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.writer.write(batch)
+            except Exception as e:
+                print(f"Warning: could not export {len(batch)} spans: {e}")
+            for _ in batch:
+                self.queue.task_done()
+
+
+def make_exporter(name: str = TRACE_EXPORTER) -> Optional[BatchExporter]:
+    if name == "jsonl":
+        return BatchExporter(JSONLinesWriter())
+    if name == "otlp":
+        return BatchExporter(OTLPWriter())
+    if name != "none":
+        print(f"Warning: unknown TRACE_EXPORTER '{name}', tracing is off")
+    return None
+
+
+exporter = make_exporter()
+if exporter is not None:
+    atexit.register(exporter.flush)
+
+
+class TracingMiddleware:
+    """ASGI middleware running every HTTP request in an http.request span"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        with span("http.request", method=scope["method"], route=route_template(scope)) as current:
+            sizes = {"response_bytes": 0}
+
+            async def send_traced(message):
+                if message["type"] == "http.response.start":
+                    current.set(status=message["status"])
+                elif message["type"] == "http.response.body":
+                    sizes["response_bytes"] += len(message.get("body", b""))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                current.set(**sizes)
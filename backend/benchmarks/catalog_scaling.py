@@ -0,0 +1,198 @@
+# catalog_scaling.py
+"""Time and peak memory of the MenuGenerationTools functions as the dish catalog grows.
+
+Usage: python -m benchmarks.catalog_scaling [--sizes 1000 10000 100000 1000000]
+           [--cuisines 50] [--keywords 200] [--ingredients 500] [--calls 200] [--seed 7]
+           [--backends memory sqlite]
+
+For every size a synthetic catalog is generated: --cuisines cuisines with
+four meals and three diets each, dish names drawn from a vocabulary that
+includes the nutrition and ingredient keywords, --keywords keywords per
+nutrition category and --ingredients grocery ingredients. Each function is
+then timed over --calls calls on random inputs and run once more under
+tracemalloc for its peak allocation:
+
+- build: DishIndex and keyword matcher construction (MenuGenerationTools(database)),
+  or writing the SQLite catalog file for the sqlite backend
+- get_dishes_by_criteria: three random cuisines, five dishes
+- check_nutritional_balance: a random week of 21 dishes, with diabetes
+- generate_grocery_list: a random 7 x 3 menu
+- fallback_menu_generation: IndianMenuAgent._fallback_menu_generation for two cuisines
+- plan: WeeklyMenuPlanner.plan for two cuisines and three meals, with diabetes
+
+The sqlite backend serves the same dishes from an app.catalog.DishCatalog,
+with ingredients and nutrition tags stored per dish. tracemalloc only sees
+Python allocations, so SQLite's page cache and the memory-mapped file are
+not part of its peaks.
+
+Prints one JSON line per size and backend.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from app.agents import IndianMenuAgent, IndianMenuDatabase, MenuGenerationTools
+from app.catalog import DishCatalog, build_catalog
+from app.planner import DAYS
+
+MEALS = ["breakfast", "lunch", "dinner", "snacks"]
+DIETS = ["veg", "non_veg", "vegan"]
+GROCERY_CATEGORIES = ["vegetables", "grains_pulses", "dairy_proteins", "spices_condiments", "others"]
+WEEK_MEALS = ["breakfast", "lunch", "dinner"]
+
+
+class SyntheticMenuDatabase(IndianMenuDatabase):
+    """IndianMenuDatabase with generated dishes, nutrition keywords and ingredients"""
+
+    def __init__(self, size: int, cuisines: int, keywords: int, ingredients: int, seed: int):
+        rng = random.Random(seed)
+        vocabulary = [f"Kw{i:05d}" for i in range(max(keywords * 4, ingredients) * 2)]
+        vocabulary += [word for words in IndianMenuDatabase.NUTRITIONAL_BALANCE.values() for word in words]
+        vocabulary += list(IndianMenuDatabase.INGREDIENT_MAPPING)
+
+        self.NUTRITIONAL_BALANCE = {
+            category: base + rng.sample(vocabulary, keywords)
+            for category, base in IndianMenuDatabase.NUTRITIONAL_BALANCE.items()
+        }
+        self.INGREDIENT_MAPPING = dict(IndianMenuDatabase.INGREDIENT_MAPPING)
+        for word in rng.sample(vocabulary, ingredients):
+            self.INGREDIENT_MAPPING.setdefault(word, (rng.choice(GROCERY_CATEGORIES), [f"{word} (fresh)"]))
+
+        cuisine_names = [f"cuisine_{i:03d}" for i in range(cuisines)]
+        self.DISHES = {cuisine: {meal: {diet: [] for diet in DIETS} for meal in MEALS} for cuisine in cuisine_names}
+        for i in range(size):
+            words = rng.sample(vocabulary, 3)
+            self.DISHES[rng.choice(cuisine_names)][rng.choice(MEALS)][rng.choice(DIETS)].append(
+                f"{words[0]} {words[1]} with {words[2]} #{i}"
+            )
+        self.cuisine_names = cuisine_names
+        self.dish_names = [name for meals in self.DISHES.values() for diets in meals.values()
+                           for names in diets.values() for name in names]
+
+    def records(self):
+        """Catalog records of the dishes, tagged by the words of their names"""
+        nutrition = {category: set(words) for category, words in self.NUTRITIONAL_BALANCE.items()}
+        for cuisine, meals in self.DISHES.items():
+            for meal, diets in meals.items():
+                for diet, names in diets.items():
+                    for name in names:
+                        words = name.split(" ")
+                        yield {
+                            "name": name,
+                            "cuisine": cuisine,
+                            "meal": meal,
+                            "diets": [diet],
+                            "cooking_minutes": 10 + len(name) % 50,
+                            "ingredients": {
+                                item: self.INGREDIENT_MAPPING[word][0]
+                                for word in words if word in self.INGREDIENT_MAPPING
+                                for item in self.INGREDIENT_MAPPING[word][1]
+                            },
+                            "nutrition_tags": [category for category, keywords in nutrition.items()
+                                               if any(word in keywords for word in words)],
+                        }
+
+
+def timed(fn: Callable[[], Any], calls: int) -> float:
+    """Microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def peak_kib(fn: Callable[[], Any], calls: int = 1) -> float:
+    """Peak memory allocated while running fn calls times, above what was allocated before"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(calls):
+            fn()
+        return round((tracemalloc.get_traced_memory()[1] - before) / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def build_tools(database: SyntheticMenuDatabase, backend: str, workdir: str):
+    """MenuGenerationTools over the database, and the build timing"""
+    if backend == "memory":
+        start = time.perf_counter()
+        tools = MenuGenerationTools(database)
+        build = {"us_per_call": round((time.perf_counter() - start) * 1e6, 1), "peak_kib": peak_kib(lambda: MenuGenerationTools(database))}
+        return tools, build
+
+    path = os.path.join(workdir, f"catalog_{len(database.dish_names)}.sqlite3")
+    start = time.perf_counter()
+    build_catalog(path, database.records())
+    build = {
+        "us_per_call": round((time.perf_counter() - start) * 1e6, 1),
+        "peak_kib": peak_kib(lambda: build_catalog(path, database.records())),
+        "file_kib": round(os.path.getsize(path) / 1024, 1),
+    }
+    return MenuGenerationTools(DishCatalog(path, database.NUTRITIONAL_BALANCE)), build
+
+
+def measure(size: int, backend: str, args, workdir: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    database = SyntheticMenuDatabase(size, args.cuisines, args.keywords, args.ingredients, args.seed)
+    generated_seconds = time.perf_counter() - start
+    rng = random.Random(args.seed)
+
+    results: Dict[str, Dict[str, float]] = {}
+    tools, results["build"] = build_tools(database, backend, workdir)
+    agent = IndianMenuAgent("benchmark", use_llm=False, cache=None, tools_handler=tools)
+
+    def random_week() -> Dict[str, Dict[str, str]]:
+        return {day: {meal: rng.choice(database.dish_names) for meal in WEEK_MEALS} for day in DAYS}
+
+    cases: List = [
+        ("get_dishes_by_criteria",
+         lambda: tools.get_dishes_by_criteria(",".join(rng.sample(database.cuisine_names, 3)), rng.choice(MEALS), rng.choice(DIETS), 5)),
+        ("check_nutritional_balance",
+         lambda: tools.check_nutritional_balance(rng.sample(database.dish_names, 21), ["diabetes"])),
+        ("generate_grocery_list", lambda: tools.generate_grocery_list(random_week())),
+        ("fallback_menu_generation",
+         lambda: agent._fallback_menu_generation({"diet_type": rng.choice(DIETS), "cuisine": rng.sample(database.cuisine_names, 2), "meals": WEEK_MEALS})),
+        ("plan",
+         lambda: agent.planner.plan({"diet_type": rng.choice(DIETS), "cuisine": rng.sample(database.cuisine_names, 2),
+                                     "meals": WEEK_MEALS, "health_conditions": ["diabetes"]})),
+    ]
+    for name, fn in cases:
+        results[name] = {"us_per_call": round(timed(fn, args.calls), 1), "peak_kib": peak_kib(fn, min(args.calls, 20))}
+
+    return {
+        "backend": backend,
+        "dishes": len(database.dish_names),
+        "cuisines": args.cuisines,
+        "nutrition_keywords": sum(len(words) for words in database.NUTRITIONAL_BALANCE.values()),
+        "ingredients": len(database.INGREDIENT_MAPPING),
+        "generate_seconds": round(generated_seconds, 2),
+        "functions": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--cuisines", type=int, default=50)
+    parser.add_argument("--keywords", type=int, default=200, help="Keywords per nutrition category")
+    parser.add_argument("--ingredients", type=int, default=500)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backends", nargs="+", choices=["memory", "sqlite"], default=["memory"])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(prefix="catalog_scaling_") as workdir:
+        for size in args.sizes:
+            for backend in args.backends:
+                print(json.dumps(measure(size, backend, args, workdir)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
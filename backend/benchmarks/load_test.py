@@ -0,0 +1,265 @@
+# load_test.py
+"""Throughput and tail latency of the API endpoints, with a stub LLM and SQLite.
+
+Usage: python -m benchmarks.load_test [--users 20] [--requests 200] [--concurrency 10]
+           [--llm-latency 0.05] [--agent react|parallel|off] [--menu-cache]
+           [--bcrypt-rounds N] [--output results.json] [--compare baseline.json]
+
+The app runs in-process behind httpx's ASGI transport on a fresh SQLite
+database, with StubChatModel in place of Together: every call sleeps
+--llm-latency seconds and answers from the prompt, with no randomness.
+Every user registers, logs in and saves preferences; then --requests calls
+each of /generate-menu, /current-menu, /menu-history and /regenerate-meal
+are spread over the users, at most --concurrency in flight. --agent picks
+how /generate-menu uses the LLM ("off" is the production default, where
+only slots the dish database cannot fill reach the agent), and the menu
+cache is bypassed unless --menu-cache is given.
+
+The JSON result holds p50/p95/p99, mean and max latency and requests per
+second per endpoint, with the configuration and git commit, so runs on
+different commits can be compared: --compare adds the change against an
+earlier result file. Needs httpx, which is not an app dependency.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PREFERENCES = {
+    "diet_type": "veg",
+    "cuisine": ["north_indian", "south_indian"],
+    "meals": ["breakfast", "lunch", "dinner"],
+    "cooking_time": "<30min",
+    "health_conditions": ["diabetes"],
+}
+PASSWORD = "load-test-password"
+
+_dish_numbers = itertools.count(1)
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that answers menu, day, slot and ReAct prompts after a fixed delay"""
+
+    latency: float = 0.0
+    meals: List[str] = PREFERENCES["meals"]
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _reply(self, prompt: str) -> str:
+        if "Reply with only the dish name" in prompt:
+            return f"Stub dish {next(_dish_numbers)}"
+        if "Reply with only a JSON object" in prompt:
+            return json.dumps({meal: f"Stub {meal} {next(_dish_numbers)}" for meal in self.meals})
+        # ReAct: one database lookup, then the final answer
+        if "Observation:" not in prompt.rsplit("Question:", 1)[-1]:
+            return "Thought: I should check the dish database\nAction: get_dishes_by_criteria\nAction Input: north_indian,lunch,veg,5"
+        if "Suggest one new dish" in prompt:
+            return f"Thought: I now know the final answer\nFinal Answer: Stub dish {next(_dish_numbers)}"
+        week = {day: {meal: f"Stub {meal} {next(_dish_numbers)}" for meal in self.meals} for day in DAYS}
+        return f"Thought: I now know the final answer\nFinal Answer: {json.dumps(week)}"
+
+    def _result(self, messages) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(prompt)))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarise(latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, Any]:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall_seconds, 1) if wall_seconds else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+async def drive(client: httpx.AsyncClient, calls: List[Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]],
+                concurrency: int):
+    """Run the calls with at most concurrency in flight; returns the responses and their summary"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(call):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await call(client)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+            return response
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(one(call) for call in calls))
+    return responses, summarise(latencies, errors, time.perf_counter() - start)
+
+
+async def run(args) -> Dict[str, Dict[str, Any]]:
+    # Imported here: the database engines are created from DATABASE_URL at import
+    from app import agents, main, metrics, tracing
+
+    llm = StubChatModel(latency=args.llm_latency, callbacks=[metrics.LLMMetricsCallback(), tracing.TracingCallback()])
+    agents._shared_agents[main.TOGETHER_API_KEY] = agents.IndianMenuAgent(
+        main.TOGETHER_API_KEY, use_llm=args.agent != "off", parallel=args.agent == "parallel",
+        cache=agents.menu_cache if args.menu_cache else None, llm=llm
+    )
+
+    users = [f"loadtest{i}" for i in range(args.users)]
+    per_user = [users[i % len(users)] for i in range(args.requests)]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    await main.app.router.startup()
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            _, results["POST /register"] = await drive(client, [
+                lambda c, u=u: c.post("/register", json={"username": u, "email": f"{u}@example.com", "password": PASSWORD})
+                for u in users
+            ], args.concurrency)
+
+            responses, results["POST /login"] = await drive(client, [
+                lambda c, u=u: c.post("/login", json={"username": u, "password": PASSWORD}) for u in users
+            ], args.concurrency)
+            headers = {u: {"Authorization": f"Bearer {r.json()['access_token']}"} for u, r in zip(users, responses)}
+
+            _, results["POST /preferences"] = await drive(client, [
+                lambda c, u=u: c.post("/preferences", json=PREFERENCES, headers=headers[u]) for u in users
+            ], args.concurrency)
+
+            _, results["POST /generate-menu"] = await drive(client, [
+                lambda c, u=u: c.post("/generate-menu", json={}, headers=headers[u]) for u in per_user
+            ], args.concurrency)
+
+            responses, results["GET /current-menu"] = await drive(client, [
+                lambda c, u=u: c.get("/current-menu", headers=headers[u]) for u in per_user
+            ], args.concurrency)
+            menu_ids = {u: r.json()["menu_id"] for u, r in zip(per_user, responses) if r.status_code == 200}
+
+            _, results["GET /menu-history"] = await drive(client, [
+                lambda c, u=u: c.get("/menu-history", params={"limit": 10}, headers=headers[u]) for u in per_user
+            ], args.concurrency)
+
+            meals = PREFERENCES["meals"]
+            _, results["POST /regenerate-meal"] = await drive(client, [
+                lambda c, u=u, i=i: c.post("/regenerate-meal", headers=headers[u], json={
+                    "menu_id": menu_ids.get(u, 0), "day": DAYS[i % len(DAYS)], "meal": meals[i % len(meals)]
+                })
+                for i, u in enumerate(per_user)
+            ], args.concurrency)
+    finally:
+        await main.app.router.shutdown()
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Relative change of p95 latency and throughput per endpoint; positive p95 or negative rps is a regression"""
+    def change(now, before):
+        return round((now - before) / before * 100, 1) if now is not None and before else None
+
+    return {
+        endpoint: {
+            "p95_change_pct": change(stats["p95_ms"], baseline[endpoint]["p95_ms"]),
+            "rps_change_pct": change(stats["rps"], baseline[endpoint]["rps"]),
+        }
+        for endpoint, stats in results.items() if endpoint in baseline
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per menu endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per stub LLM call")
+    parser.add_argument("--agent", choices=["react", "parallel", "off"], default="react")
+    parser.add_argument("--menu-cache", action="store_true", help="Serve repeated preferences from the menu cache")
+    parser.add_argument("--bcrypt-rounds", type=int, help="Defaults to the app's BCRYPT_ROUNDS")
+    parser.add_argument("--output", help="Also write the result JSON to this file")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'load_test.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["STATE_CACHE_BACKEND"] = "memory"
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+    endpoints = asyncio.run(run(args))
+    from app.utils import BCRYPT_ROUNDS
+    report = {
+        "benchmark": "load_test",
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "users": args.users,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "agent": args.agent,
+            "menu_cache": args.menu_cache,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "python": platform.python_version(),
+        },
+        "endpoints": endpoints,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["baseline_commit"] = baseline.get("commit")
+        report["comparison"] = compare(endpoints, baseline["endpoints"])
+        if baseline.get("config") != report["config"]:
+            print("Warning: the baseline was run with a different configuration", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
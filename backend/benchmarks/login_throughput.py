@@ -0,0 +1,72 @@
+# login_throughput.py
+"""Password verification throughput of the login path at different bcrypt costs.
+
+Usage: python -m benchmarks.login_throughput [--rounds 4 8 10 12] [--logins 64] [--concurrency 16]
+
+Runs concurrent verify_and_update_password_async calls, which is the work
+/login does per request, and reports logins per second and latency
+percentiles for each cost factor.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+from app import utils
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def measure(rounds: int, logins: int, concurrency: int) -> dict:
+    utils.pwd_context = CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+    )
+    stored = utils.hash_password("correct horse battery staple")
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+    rejected = 0
+
+    async def one_login():
+        nonlocal rejected
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await utils.verify_and_update_password_async("correct horse battery staple", stored)
+            except utils.HashingBusyError:
+                rejected += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one_login() for _ in range(logins)])
+    elapsed = time.perf_counter() - start
+    return {
+        "rounds": rounds,
+        "logins": len(latencies),
+        "rejected": rejected,
+        "logins_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[4, 8, 10, 12])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    print(f"hash workers: {utils.HASH_WORKERS}, queue depth: {utils.HASH_QUEUE_DEPTH}")
+    for rounds in args.rounds:
+        print(json.dumps(asyncio.run(measure(rounds, args.logins, args.concurrency))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# menu_serialisation.py
+"""Per-request serialisation cost of /current-menu, before and after stored response JSON.
+
+Usage: python -m benchmarks.menu_serialisation [--iterations 20000]
+
+"decode_validate_encode" is the old path: json.loads of menu_data and
+generation_prompt, response_model validation, jsonable_encoder and the
+stdlib JSONResponse. "validate_fastjson" keeps validation but renders with
+MenuJSONResponse, as the dict-returning menu endpoints now do.
+"stored_bytes" is the /current-menu path: the JSON written with the menu is
+sent as-is.
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_response_field
+
+from app import fastjson, schema
+from app.fastjson import MenuJSONResponse
+from app.menus import menu_response_json
+from app.planner import DAYS
+
+MEALS = ["breakfast", "lunch", "snacks", "dinner"]
+
+
+def sample_menu_row():
+    menu = {day: {meal: f"{day} {meal} special with dal and roti" for meal in MEALS} for day in DAYS}
+    preferences = {
+        "diet_type": "veg",
+        "cuisine": ["north_indian", "south_indian"],
+        "meals": MEALS,
+        "cooking_time": "<30min",
+        "health_conditions": ["diabetes"],
+    }
+    return {
+        "id": 42,
+        "menu_data": json.dumps(menu),
+        "generation_prompt": json.dumps(preferences),
+        "created_at": "2024-01-01T10:00:00",
+    }
+
+
+def timed(fn, iterations: int) -> float:
+    """Microseconds per call"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    row = sample_menu_row()
+    field = create_response_field(name="response", type_=schema.MenuResponse)
+
+    def response_dict():
+        return {
+            "menu": json.loads(row["menu_data"]),
+            "preferences_used": json.loads(row["generation_prompt"]),
+            "generated_at": row["created_at"],
+            "menu_id": row["id"],
+        }
+
+    def decode_validate_encode():
+        value, _ = field.validate(response_dict(), {}, loc=("response",))
+        return JSONResponse(jsonable_encoder(value)).body
+
+    def validate_fastjson():
+        value, _ = field.validate(response_dict(), {}, loc=("response",))
+        return MenuJSONResponse(jsonable_encoder(value)).body
+
+    stored = menu_response_json(response_dict())
+
+    def stored_bytes():
+        return MenuJSONResponse(stored).body
+
+    assert json.loads(decode_validate_encode()) == json.loads(stored_bytes()) == json.loads(validate_fastjson())
+    results = {name: round(timed(fn, args.iterations), 2) for name, fn in [
+        ("decode_validate_encode", decode_validate_encode),
+        ("validate_fastjson", validate_fastjson),
+        ("stored_bytes", stored_bytes),
+    ]}
+    print(json.dumps({
+        "orjson": fastjson.orjson is not None,
+        "response_bytes": len(stored.encode()),
+        "us_per_request": results,
+        "speedup": round(results["decode_validate_encode"] / results["stored_bytes"], 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
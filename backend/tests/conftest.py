@@ -0,0 +1,81 @@
+# conftest.py
+import itertools
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# The app reads its settings on import: use a throwaway SQLite file and cheap hashes
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="rasoi-tests-"), "test.db"))
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app import database, main, models  # noqa: E402
+from app.menus import save_weekly_menu  # noqa: E402
+from app.planner import DAYS  # noqa: E402
+
+PREFERENCES = {
+    "diet_type": "veg",
+    "cuisine": ["north_indian", "south_indian"],
+    "meals": ["breakfast", "lunch", "dinner"],
+    "cooking_time": "<30min",
+    "health_conditions": ["diabetes"],
+}
+
+_user_numbers = itertools.count()
+_dish_numbers = itertools.count()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    models.Base.metadata.create_all(bind=database.engine)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_user(client, db):
+    """Register a new user; returns (user id, authorization headers)"""
+    def make():
+        name = f"user{next(_user_numbers)}"
+        client.post("/register", json={"username": name, "email": f"{name}@example.com", "password": "secret"})
+        token = client.post("/login", json={"username": name, "password": "secret"}).json()["access_token"]
+        user_id = db.execute(select(models.User.id).where(models.User.username == name)).scalar_one()
+        return user_id, {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def user(make_user):
+    """A registered user: (user id, authorization headers)"""
+    return make_user()
+
+
+@pytest.fixture
+def save_menu(db):
+    """Store a new active menu of distinct dishes for a user; returns the WeeklyMenu row"""
+    def save(user_id: int, generated_at: datetime = None) -> models.WeeklyMenu:
+        generated_at = generated_at or datetime.now() - timedelta(minutes=5)
+        menu = {day: {meal: f"Dish {next(_dish_numbers)}" for meal in PREFERENCES["meals"]} for day in DAYS}
+        return save_weekly_menu(db, user_id, {
+            "menu": menu,
+            "preferences_used": PREFERENCES,
+            "generated_at": generated_at.isoformat(),
+        })
+    return save
@@ -0,0 +1,81 @@
+# test_conditional_get.py
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import models
+
+
+def bump_version(db, menu_id):
+    """Edit a menu the way another replica would: the version changes, no cache is told"""
+    db.execute(
+        update(models.WeeklyMenu)
+        .where(models.WeeklyMenu.id == menu_id)
+        .values(version=models.WeeklyMenu.version + 1, updated_at=datetime.now())
+    )
+    db.commit()
+
+
+def test_current_menu_sends_validators(client, user, save_menu):
+    menu = save_menu(user[0])
+
+    response = client.get("/current-menu", headers=user[1])
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{menu.id}.1"'
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert "last-modified" in response.headers
+
+
+def test_current_menu_answers_a_matching_etag_with_304(client, user, save_menu):
+    save_menu(user[0])
+    etag = client.get("/current-menu", headers=user[1]).headers["etag"]
+
+    response = client.get("/current-menu", headers={**user[1], "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_current_menu_answers_if_modified_since_with_304(client, user, save_menu):
+    save_menu(user[0])
+    last_modified = client.get("/current-menu", headers=user[1]).headers["last-modified"]
+
+    response = client.get("/current-menu", headers={**user[1], "If-Modified-Since": last_modified})
+
+    assert response.status_code == 304
+
+
+def test_current_menu_is_sent_again_once_edited(client, db, user, save_menu):
+    menu = save_menu(user[0])
+    etag = client.get("/current-menu", headers=user[1]).headers["etag"]
+    bump_version(db, menu.id)
+
+    response = client.get("/current-menu", headers={**user[1], "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{menu.id}.2"'
+
+
+def test_new_menu_changes_the_etag(client, user, save_menu):
+    save_menu(user[0])
+    etag = client.get("/current-menu", headers=user[1]).headers["etag"]
+    save_menu(user[0])
+
+    response = client.get("/current-menu", headers={**user[1], "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_menu_history_answers_a_matching_etag_with_304(client, db, user, save_menu):
+    menu = save_menu(user[0])
+    etag = client.get("/menu-history", headers=user[1]).headers["etag"]
+
+    assert client.get("/menu-history", headers={**user[1], "If-None-Match": etag}).status_code == 304
+
+    bump_version(db, menu.id)
+    response = client.get("/menu-history", headers={**user[1], "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,112 @@
+# test_jobs.py
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models
+from app.jobs import LOST_ERROR, JobQueue, QueueFullError
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_workers=1, max_queued=1, retention_seconds=60, stale_seconds=60)
+    yield queue
+    queue.shutdown(wait=True)
+
+
+def add_job(db, user_id, status, created_at, finished_at=None):
+    job = models.MenuJob(id=uuid.uuid4().hex, user_id=user_id, status=status,
+                         created_at=created_at, finished_at=finished_at)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def wait_for(queue, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {status}")
+
+
+def test_job_runs_and_keeps_its_result(queue, user):
+    user_id, _ = user
+    job = queue.submit(user_id, lambda: {"menu": {"Monday": {"lunch": "Dal"}}})
+
+    assert job["status"] == "queued"
+    done = wait_for(queue, job["job_id"], "completed")
+    assert done["result"] == {"menu": {"Monday": {"lunch": "Dal"}}}
+    assert done["owner"] == user_id
+
+
+def test_failed_job_reports_its_error(queue, user):
+    def fail():
+        raise ValueError("no dishes")
+
+    job = queue.submit(user[0], fail)
+
+    assert wait_for(queue, job["job_id"], "failed")["error"] == "no dishes"
+
+
+def test_unfinished_job_of_an_owner_is_returned_instead_of_a_duplicate(queue, user):
+    release = threading.Event()
+    first = queue.submit(user[0], release.wait)
+    try:
+        assert queue.submit(user[0], dict)["job_id"] == first["job_id"]
+    finally:
+        release.set()
+    wait_for(queue, first["job_id"], "completed")
+
+
+def test_full_queue_rejects_jobs(queue, user):
+    release = threading.Event()
+    owners = [user[0]] + [user[0] + 1000 + i for i in range(2)]
+    try:
+        queue.submit(owners[0], release.wait)
+        queue.submit(owners[1], release.wait)
+        with pytest.raises(QueueFullError):
+            queue.submit(owners[2], release.wait)
+    finally:
+        release.set()
+
+
+def test_stale_unfinished_job_is_reported_lost(queue, db, user):
+    job_id = add_job(db, user[0], "running", datetime.now() - timedelta(seconds=120))
+
+    job = queue.get(job_id)
+
+    assert job["status"] == "failed"
+    assert job["error"] == LOST_ERROR
+
+
+def test_stale_job_does_not_block_a_new_submission(queue, db, user):
+    stale_id = add_job(db, user[0], "queued", datetime.now() - timedelta(seconds=120))
+
+    job = queue.submit(user[0], dict)
+
+    assert job["job_id"] != stale_id
+    wait_for(queue, job["job_id"], "completed")
+
+
+def test_recent_unfinished_job_is_not_reported_lost(queue, db, user):
+    job_id = add_job(db, user[0], "running", datetime.now() - timedelta(seconds=30))
+
+    assert queue.get(job_id)["status"] == "running"
+
+
+def test_finished_job_is_gone_after_retention(queue, db, user):
+    old = datetime.now() - timedelta(seconds=120)
+    expired_id = add_job(db, user[0], "completed", old, finished_at=old)
+    recent_id = add_job(db, user[0], "completed", old, finished_at=datetime.now())
+
+    assert queue.get(expired_id) is None
+    assert queue.get(recent_id)["status"] == "completed"
+
+    queue._prune()
+    assert db.get(models.MenuJob, expired_id, populate_existing=True) is None
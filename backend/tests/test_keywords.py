@@ -0,0 +1,52 @@
+# test_keywords.py
+import random
+
+from app.agents import DISH_TAGGER, IndianMenuDatabase, MenuGenerationTools
+from app.keywords import INGREDIENT_TAG, NUTRITION_TAG, KeywordMatcher
+
+
+def substring_tags(groups, text):
+    """The matching the keyword matcher replaced: a substring test per keyword"""
+    return {label for label, keywords in groups.items() if any(keyword in text for keyword in keywords)}
+
+
+def all_dishes():
+    return [dish for meals in IndianMenuDatabase.DISHES.values() for diets in meals.values()
+            for dishes in diets.values() for dish in dishes]
+
+
+def test_matches_substring_search_on_random_overlapping_keywords():
+    rng = random.Random(3)
+    alphabet = "abc "
+    for _ in range(300):
+        groups = {
+            label: ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 4))]
+            for label in range(rng.randint(1, 6))
+        }
+        matcher = KeywordMatcher(groups)
+        for _ in range(10):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+            assert matcher.tags(text) == substring_tags(groups, text), (groups, text)
+
+
+def test_dish_tagger_matches_substring_search_on_every_dish():
+    groups = {
+        **{(NUTRITION_TAG, category): keywords for category, keywords in IndianMenuDatabase.NUTRITIONAL_BALANCE.items()},
+        **{(INGREDIENT_TAG, ingredient): [ingredient] for ingredient in IndianMenuDatabase.INGREDIENT_MAPPING},
+    }
+    for dish in all_dishes() + ["", "Dal", "Paneer Paratha + Dal Tadka", "dal (lowercase)"]:
+        assert DISH_TAGGER.tags(dish) == substring_tags(groups, dish), dish
+
+
+def test_balance_counts_match_substring_search():
+    tools = MenuGenerationTools()
+    balance = IndianMenuDatabase.NUTRITIONAL_BALANCE
+    rng = random.Random(5)
+    dishes = sorted(set(all_dishes()))
+    for _ in range(50):
+        week = rng.sample(dishes, 21)
+        protein = sum(any(k in dish for k in balance["high_protein"]) for dish in week)
+        fiber = sum(any(k in dish for k in balance["high_fiber"]) for dish in week)
+        friendly = sum(any(k in dish for k in balance["diabetic_friendly"]) for dish in week)
+        expected = (25 if protein >= 2 else 0) + (25 if fiber >= 3 else 0) + 25 + (25 if friendly >= 21 * 0.6 else 0)
+        assert tools.check_nutritional_balance(week, ["diabetes"])["balance_score"] == expected
@@ -0,0 +1,63 @@
+# test_menu_history.py
+
+
+def history_pages(client, headers, limit):
+    pages, params = [], {"limit": limit}
+    while True:
+        response = client.get("/menu-history", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(page)
+        if page["next_cursor"] is None:
+            return pages
+        params = {"limit": limit, "before_id": page["next_cursor"]}
+
+
+def test_cursors_walk_every_menu_newest_first(client, user, save_menu):
+    user_id, headers = user
+    ids = [save_menu(user_id).id for _ in range(5)]
+
+    pages = history_pages(client, headers, limit=2)
+
+    assert [len(page["menus"]) for page in pages] == [2, 2, 1]
+    assert [menu["id"] for page in pages for menu in page["menus"]] == sorted(ids, reverse=True)
+    assert [page["next_cursor"] for page in pages] == [pages[0]["menus"][-1]["id"], pages[1]["menus"][-1]["id"], None]
+
+
+def test_only_the_newest_menu_is_active(client, user, save_menu):
+    user_id, headers = user
+    for _ in range(3):
+        save_menu(user_id)
+
+    menus = client.get("/menu-history", headers=headers).json()["menus"]
+
+    assert [menu["is_active"] for menu in menus] == [True, False, False]
+
+
+def test_page_that_fits_has_no_cursor(client, user, save_menu):
+    user_id, headers = user
+    save_menu(user_id)
+    save_menu(user_id)
+
+    page = client.get("/menu-history", params={"limit": 2}, headers=headers).json()
+
+    assert len(page["menus"]) == 2
+    assert page["next_cursor"] is None
+
+
+def test_history_holds_only_the_user_own_menus_with_previews(client, make_user, save_menu):
+    user_id, headers = make_user()
+    other_id, _ = make_user()
+    menu = save_menu(user_id)
+    save_menu(other_id)
+
+    page = client.get("/menu-history", headers=headers).json()
+
+    assert [item["id"] for item in page["menus"]] == [menu.id]
+    current = client.get("/current-menu", headers=headers).json()["menu"]
+    assert page["menus"][0]["menu_preview"] == {day: list(meals.values()) for day, meals in current.items()}
+
+
+def test_limit_is_bounded(client, user):
+    assert client.get("/menu-history", params={"limit": 0}, headers=user[1]).status_code == 422
+    assert client.get("/menu-history", params={"limit": 10_000}, headers=user[1]).status_code == 422
@@ -0,0 +1,110 @@
+# test_menus.py
+import asyncio
+import json
+
+from sqlalchemy import select
+
+from app import database, fastjson, models
+from app.menus import (
+    MAX_DISH_LENGTH, MAX_MEAL_LENGTH, clean_menu, menu_item_rows, save_weekly_menu, set_menu_slots
+)
+
+
+def test_clean_menu_keeps_weekdays_and_drops_everything_else():
+    menu = {
+        "monday": {"lunch": "Dal"},
+        " Tuesday ": {"dinner": "Rajma"},
+        "notes": "Drink water",
+        "analysis": {"score": 75},
+        "Wednesday": "Rest day",
+    }
+
+    assert clean_menu(menu) == {"Monday": {"lunch": "Dal"}, "Tuesday": {"dinner": "Rajma"}}
+
+
+def test_clean_menu_flattens_and_truncates_dishes():
+    menu = {"Monday": {
+        "breakfast": {"dish": "Poha", "calories": 250},
+        "lunch": {"name": "Dal Tadka"},
+        "dinner": "  " + "x" * (MAX_DISH_LENGTH + 10),
+        "snacks": None,
+        "m" * (MAX_MEAL_LENGTH + 5): 42,
+    }}
+
+    cleaned = clean_menu(menu)["Monday"]
+
+    assert cleaned["breakfast"] == "Poha"
+    assert cleaned["lunch"] == "Dal Tadka"
+    assert cleaned["dinner"] == "x" * MAX_DISH_LENGTH
+    assert "snacks" not in cleaned
+    assert cleaned["m" * MAX_MEAL_LENGTH] == "42"
+
+
+def test_clean_menu_of_something_else_is_empty():
+    assert clean_menu(None) == {}
+    assert clean_menu(["Monday"]) == {}
+
+
+def test_menu_item_rows_follow_the_cleaned_menu():
+    rows = menu_item_rows(7, {"Monday": {"lunch": {"dish": "Dal"}}, "notes": "x"})
+
+    assert rows == [{"menu_id": 7, "day": "Monday", "meal": "lunch", "dish": "Dal"}]
+
+
+def test_saved_menu_stores_the_same_cleaned_dishes_everywhere(db, user):
+    menu = save_weekly_menu(db, user[0], {
+        "menu": {"monday": {"lunch": {"dish": "Dal", "calories": 300}}, "tips": ["Drink water"]},
+        "preferences_used": {"diet_type": "veg"},
+        "generated_at": "2026-01-05T12:00:00",
+    })
+
+    items = db.execute(
+        select(models.MenuItem.day, models.MenuItem.meal, models.MenuItem.dish).where(models.MenuItem.menu_id == menu.id)
+    ).all()
+    assert [tuple(item) for item in items] == [("Monday", "lunch", "Dal")]
+    assert json.loads(menu.response_json)["menu"] == {"Monday": {"lunch": "Dal"}}
+    assert json.loads(menu.menu_preview) == {"Monday": ["Dal"]}
+
+
+def run_set_menu_slots(menu, dishes, version):
+    """set_menu_slots on the stored response of menu in its own committed transaction"""
+    async def run():
+        async with database.AsyncSessionLocal() as session:
+            body = await set_menu_slots(session, fastjson.loads(menu.response_json), dishes, version)
+            await session.commit()
+            return body
+    return asyncio.run(run())
+
+
+def stored_dish(db, menu_id, day, meal):
+    return db.execute(
+        select(models.MenuItem.dish)
+        .where(models.MenuItem.menu_id == menu_id, models.MenuItem.day == day, models.MenuItem.meal == meal)
+    ).scalar_one()
+
+
+def test_set_menu_slots_updates_the_slot_and_bumps_the_version(db, user, save_menu):
+    menu = save_menu(user[0])
+
+    body = run_set_menu_slots(menu, {("Monday", "lunch"): "Palak Paneer"}, version=1)
+
+    assert json.loads(body)["menu"]["Monday"]["lunch"] == "Palak Paneer"
+    db.refresh(menu)
+    assert menu.version == 2
+    assert menu.response_json == body
+    assert json.loads(menu.menu_preview)["Monday"][1] == "Palak Paneer"
+    assert stored_dish(db, menu.id, "Monday", "lunch") == "Palak Paneer"
+
+
+def test_set_menu_slots_writes_nothing_when_the_version_moved_on(db, user, save_menu):
+    menu = save_menu(user[0])
+    original = menu.response_json
+    assert run_set_menu_slots(menu, {("Monday", "lunch"): "First Edit"}, version=1) is not None
+
+    # A second writer that read the menu at version 1 too
+    assert run_set_menu_slots(menu, {("Tuesday", "dinner"): "Lost Edit"}, version=1) is None
+
+    db.refresh(menu)
+    assert menu.version == 2
+    assert json.loads(menu.response_json)["menu"]["Tuesday"]["dinner"] == json.loads(original)["menu"]["Tuesday"]["dinner"]
+    assert stored_dish(db, menu.id, "Tuesday", "dinner") != "Lost Edit"
@@ -0,0 +1,95 @@
+# test_planner.py
+from app.agents import MenuGenerationTools
+from app.planner import DAYS, DIET_COMPATIBILITY, WeeklyMenuPlanner, placeholder_dish
+
+from conftest import PREFERENCES
+
+
+def dishes_of(menu):
+    return [dish for meals in menu.values() for dish in meals.values()]
+
+
+def allowed(tools, cuisines, meal, diet_type):
+    return {dish for diet in DIET_COMPATIBILITY[diet_type] for dish in tools.index.union(cuisines, meal, diet)}
+
+
+def test_plan_fills_every_slot_with_unique_allowed_dishes():
+    tools = MenuGenerationTools()
+    plan = WeeklyMenuPlanner(tools, seed=3).plan(PREFERENCES)
+
+    assert list(plan["menu"]) == DAYS
+    assert plan["unfilled_slots"] == []
+    dishes = dishes_of(plan["menu"])
+    assert len(dishes) == len(set(dishes)) == len(DAYS) * len(PREFERENCES["meals"])
+    for day, meals in plan["menu"].items():
+        assert list(meals) == PREFERENCES["meals"]
+        for meal, dish in meals.items():
+            assert dish in allowed(tools, PREFERENCES["cuisine"], meal, "veg")
+
+
+def test_plan_score_is_the_tools_balance_score():
+    tools = MenuGenerationTools()
+    plan = WeeklyMenuPlanner(tools, seed=3).plan(PREFERENCES)
+
+    expected = tools.check_nutritional_balance(dishes_of(plan["menu"]), PREFERENCES["health_conditions"])
+    assert plan["balance_score"] == expected["balance_score"]
+
+
+def test_plan_is_deterministic_for_a_seed():
+    tools = MenuGenerationTools()
+    assert WeeklyMenuPlanner(tools, seed=11).plan(PREFERENCES) == WeeklyMenuPlanner(tools, seed=11).plan(PREFERENCES)
+
+
+def test_plan_reports_slots_without_candidates():
+    plan = WeeklyMenuPlanner(MenuGenerationTools(), seed=1).plan({**PREFERENCES, "cuisine": ["atlantis"]})
+
+    assert len(plan["unfilled_slots"]) == len(DAYS) * len(PREFERENCES["meals"])
+    assert plan["menu"]["Monday"]["lunch"] == placeholder_dish("lunch", "veg")
+
+
+def test_plan_samples_large_pools_down_to_the_slot_limit():
+    tools = MenuGenerationTools()
+    planner = WeeklyMenuPlanner(tools, seed=5, slot_candidates=10)
+    preferences = {**PREFERENCES, "diet_type": "non_veg", "health_conditions": []}
+
+    candidates = planner.candidates(preferences["cuisine"], "lunch", "non_veg", limit=10)
+    assert len(candidates) <= 10
+    assert set(candidates) <= allowed(tools, preferences["cuisine"], "lunch", "non_veg")
+
+    plan = planner.plan(preferences)
+    dishes = [dish for dish in dishes_of(plan["menu"]) if not dish.startswith("Simple ")]
+    assert len(dishes) == len(set(dishes))
+
+
+def test_replace_picks_unused_dishes_and_keeps_other_slots():
+    tools = MenuGenerationTools()
+    planner = WeeklyMenuPlanner(tools, seed=7)
+    menu = planner.plan(PREFERENCES)["menu"]
+    slots = [("Monday", "breakfast"), ("Friday", "dinner")]
+
+    result = planner.replace(menu, slots, PREFERENCES)
+
+    assert set(result["replaced"]) == set(slots)
+    assert result["unfilled"] == []
+    for day, meal in slots:
+        new = result["menu"][day][meal]
+        assert new != menu[day][meal]
+        assert new not in dishes_of(menu)
+        assert new in allowed(tools, PREFERENCES["cuisine"], meal, "veg")
+    untouched = [(day, meal) for day in DAYS for meal in PREFERENCES["meals"] if (day, meal) not in slots]
+    assert all(result["menu"][day][meal] == menu[day][meal] for day, meal in untouched)
+    dishes = dishes_of(result["menu"])
+    assert len(dishes) == len(set(dishes))
+    expected = tools.check_nutritional_balance(dishes, PREFERENCES["health_conditions"])
+    assert result["balance_score"] == expected["balance_score"]
+
+
+def test_replace_leaves_a_slot_without_candidates_unchanged():
+    planner = WeeklyMenuPlanner(MenuGenerationTools(), seed=7)
+    menu = {"Monday": {"breakfast": "Mystery Dish"}}
+
+    result = planner.replace(menu, [("Monday", "breakfast")], {**PREFERENCES, "cuisine": ["atlantis"]})
+
+    assert result["menu"] == menu
+    assert result["unfilled"] == [("Monday", "breakfast")]
+    assert result["replaced"] == {}
@@ -0,0 +1,88 @@
+# test_regenerate_meal.py
+import copy
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from app import fastjson, main, models
+
+
+class FakeAgent:
+    """Stands in for the menu agent: names each requested slot's new dish, optionally after a side effect"""
+
+    def __init__(self, during=None):
+        self.during = during
+
+    def regenerate_slots(self, menu, preferences, slots):
+        if self.during:
+            self.during()
+        menu = copy.deepcopy(menu)
+        for day, meal in slots:
+            menu[day][meal] = f"New {day} {meal}"
+        return {"menu": menu}
+
+
+@pytest.fixture
+def use_agent(monkeypatch):
+    def use(agent):
+        monkeypatch.setattr(main.agents, "get_menu_agent", lambda api_key: agent)
+    return use
+
+
+def edit_concurrently(db, menu_id, day, meal, dish):
+    """What another request committing an edit looks like in the database"""
+    def edit():
+        menu = db.get(models.WeeklyMenu, menu_id, populate_existing=True)
+        body = fastjson.loads(menu.response_json)
+        body["menu"][day][meal] = dish
+        db.execute(
+            update(models.WeeklyMenu)
+            .where(models.WeeklyMenu.id == menu_id)
+            .values(response_json=fastjson.dumps(body).decode(), version=menu.version + 1, updated_at=datetime.now())
+        )
+        db.commit()
+    return edit
+
+
+def regenerate(client, headers, menu_id, day="Monday", meal="breakfast"):
+    return client.post("/regenerate-meal", json={"menu_id": menu_id, "day": day, "meal": meal}, headers=headers)
+
+
+def test_regenerated_dish_is_stored(client, db, user, save_menu, use_agent):
+    menu = save_menu(user[0])
+    use_agent(FakeAgent())
+
+    response = regenerate(client, user[1], menu.id)
+
+    assert response.status_code == 200
+    assert response.json()["menu"]["Monday"]["breakfast"] == "New Monday breakfast"
+    assert client.get("/current-menu", headers=user[1]).headers["etag"] == f'"{menu.id}.2"'
+
+
+def test_concurrent_edit_is_kept(client, db, user, save_menu, use_agent):
+    menu = save_menu(user[0])
+    client.get("/current-menu", headers=user[1])
+    use_agent(FakeAgent(during=edit_concurrently(db, menu.id, "Tuesday", "lunch", "Concurrent Lunch")))
+
+    response = regenerate(client, user[1], menu.id)
+
+    assert response.status_code == 200
+    current = client.get("/current-menu", headers=user[1])
+    assert current.json()["menu"]["Monday"]["breakfast"] == "New Monday breakfast"
+    assert current.json()["menu"]["Tuesday"]["lunch"] == "Concurrent Lunch"
+    assert current.headers["etag"] == f'"{menu.id}.3"'
+
+
+def test_conflict_on_the_retry_answers_409(client, user, save_menu, use_agent, monkeypatch):
+    menu = save_menu(user[0])
+    use_agent(FakeAgent())
+
+    async def always_stale(db, response, dishes, version):
+        return None
+    monkeypatch.setattr(main, "set_menu_slots", always_stale)
+
+    response = regenerate(client, user[1], menu.id)
+
+    assert response.status_code == 409
+    assert client.get("/current-menu", headers=user[1]).headers["etag"] == f'"{menu.id}.1"'